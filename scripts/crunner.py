@@ -20,6 +20,7 @@ from spitfire.compiler import options
 from spitfire.compiler import util
 from spitfire.compiler import visitor
 from spitfire import runtime
+from spitfire.runtime import filters
 from spitfire.runtime import runner
 from spitfire.runtime import udn
 
@@ -299,6 +300,9 @@ if __name__ == '__main__':
         spt_options.debug_flags = []
 
     udn.set_accelerator(spt_options.enable_c_accelerator, enable_test_mode=True)
+    # templates bind the default filter when spitfire.runtime.template is
+    # imported, which happens when the first test template is loaded.
+    filters.set_accelerator(spt_options.enable_c_accelerator)
 
     spt_compiler_args = compiler.Compiler.args_from_optparse(spt_options)
     spt_compiler = compiler.Compiler(**spt_compiler_args)
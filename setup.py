@@ -39,10 +39,13 @@ PACKAGES = ['spitfire',
 
 PY_MODULES = ['third_party.yapps2.yappsrt']
 
-SCRIPTS = ['scripts/crunner.py', 'scripts/spitfire-compile']
+SCRIPTS = ['scripts/crunner.py', 'scripts/spitfire-bundle',
+           'scripts/spitfire-compile']
 
 EXT_MODULES = [Extension('spitfire.runtime._baked',
                          [os.path.join('spitfire', 'runtime', '_baked.c')]),
+               Extension('spitfire.runtime._filters',
+                         [os.path.join('spitfire', 'runtime', '_filters.c')]),
                Extension('spitfire.runtime._template',
                          [os.path.join('spitfire', 'runtime', '_template.c')]),
                Extension('spitfire.runtime._udn',
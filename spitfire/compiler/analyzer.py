@@ -4,12 +4,17 @@
 # license that can be found in the LICENSE file.
 
 import copy
+import math
 import os.path
 
 from spitfire.compiler import ast
 from spitfire.compiler import util
+from spitfire import runtime
 from spitfire import text
 
+# values a pure function may return and still be inlined as a LiteralNode.
+_pure_literal_types = (basestring, bool, int, long, float, type(None))
+
 
 def tree_walker(node):
     yield node
@@ -18,6 +23,19 @@ def tree_walker(node):
             yield ng
 
 
+def _has_loop_control(node):
+    # look for a #break or #continue that isn't inside a nested #for loop.
+    child_nodes = list(node.child_nodes)
+    if isinstance(node, ast.IfNode):
+        child_nodes.extend(node.else_.child_nodes)
+    for n in child_nodes:
+        if isinstance(n, (ast.BreakNode, ast.ContinueNode)):
+            return True
+        if not isinstance(n, ast.ForNode) and _has_loop_control(n):
+            return True
+    return False
+
+
 class SemanticAnalyzerError(Exception):
     pass
 
@@ -67,6 +85,8 @@ class SemanticAnalyzer(object):
         self.template = None
         self.strip_lines = False
         self.uses_raw = False
+        self.cache_block_count = 0
+        self._placeholder_call = None
         self.base_extends_identifiers = []
         if self.compiler.base_extends_package:
             # this means that extends are supposed to all happen relative to
@@ -218,6 +238,86 @@ class SemanticAnalyzer(object):
         self.strip_lines = False
         return self.optimize_buffer_writes(new_nodes)
 
+    # #cache key=$key ttl=$ttl
+    #   ...
+    # #end cache
+    #
+    # _fragment_key_1 = (__name__, 1, key)
+    # _fragment_1 = self.get_cached_fragment(_fragment_key_1)
+    # if _fragment_1 is None:
+    #   <capture output>
+    #   ...
+    #   _fragment_1 = <captured output>
+    #   _fragment_1 = self.cache_fragment(_fragment_key_1, _fragment_1, ttl)
+    # _buffer_write(_fragment_1)
+    def analyzeCacheBlockNode(self, pnode):
+        arg_node_map = pnode.parameter_list.get_arg_node_map()
+        for name in sorted(arg_node_map):
+            if name not in ('key', 'ttl'):
+                self.compiler.error(
+                    SemanticAnalyzerError('unknown #cache parameter: %s' %
+                                          name),
+                    pos=pnode.pos)
+        if all([isinstance(pn, _BLANK_NODES) for pn in pnode.child_nodes]):
+            self.compiler.error(
+                SemanticAnalyzerError("can't define an empty #cache block"),
+                pos=pnode.pos)
+        # the captured buffer has to be swapped back before leaving the block.
+        if _has_loop_control(pnode):
+            self.compiler.error(
+                SemanticAnalyzerError(
+                    "can't #break or #continue out of a #cache block"),
+                pos=pnode.pos)
+
+        self.cache_block_count += 1
+        suffix = self.cache_block_count
+        fragment = '_fragment_%s' % suffix
+        fragment_key = '_fragment_key_%s' % suffix
+        saved_buffer = '_fragment_buffer_%s' % suffix
+
+        # fragments are identified by the module they are defined in, so
+        # templates that extend each other don't share entries.
+        key_expression = ast.TupleLiteralNode(pos=pnode.pos)
+        key_expression.append(ast.IdentifierNode('__name__', pos=pnode.pos))
+        key_expression.append(ast.LiteralNode(suffix, pos=pnode.pos))
+        key_expression.append(
+            arg_node_map.get('key', ast.LiteralNode(None, pos=pnode.pos)))
+
+        get_fragment = ast.CallFunctionNode(
+            ast.GetAttrNode(ast.IdentifierNode('self'), 'get_cached_fragment'),
+            ast.ArgListNode([ast.IdentifierNode(fragment_key)]),
+            pos=pnode.pos)
+        cache_args = [ast.IdentifierNode(fragment_key),
+                      ast.IdentifierNode(fragment)]
+        if 'ttl' in arg_node_map:
+            cache_args.append(arg_node_map['ttl'])
+        cache_fragment = ast.CallFunctionNode(
+            ast.GetAttrNode(ast.IdentifierNode('self'), 'cache_fragment'),
+            ast.ArgListNode(cache_args),
+            pos=pnode.pos)
+
+        if_node = ast.IfNode(
+            ast.BinOpNode('is', ast.IdentifierNode(fragment),
+                          ast.LiteralNode(None)),
+            pos=pnode.pos)
+        if_node.append(ast.CaptureStartNode(saved_buffer, pos=pnode.pos))
+        if_node.extend(pnode.child_nodes)
+        if_node.append(ast.CaptureEndNode(saved_buffer, fragment,
+                                          pos=pnode.pos))
+        if_node.append(ast.AssignNode(ast.IdentifierNode(fragment),
+                                      cache_fragment,
+                                      pos=pnode.pos))
+
+        node_list = []
+        node_list.extend(self.build_ast(ast.AssignNode(
+            ast.IdentifierNode(fragment_key), key_expression, pos=pnode.pos)))
+        node_list.extend(self.build_ast(ast.AssignNode(
+            ast.IdentifierNode(fragment), get_fragment, pos=pnode.pos)))
+        node_list.extend(self.build_ast(if_node))
+        node_list.append(ast.BufferWrite(ast.IdentifierNode(fragment),
+                                         pos=pnode.pos))
+        return node_list
+
     def analyzeGetUDNNode(self, pnode):
         children = pnode.getChildNodes()
         if isinstance(children[0], ast.PlaceholderNode):
@@ -515,6 +615,9 @@ class SemanticAnalyzer(object):
         # print ' '.join(analyzePlaceholderSubstitutionNode', pnode,
         #                pnode.parameter_list.get_arg_map())
         node_list = []
+        # a pure call that is output directly is folded below, once we know
+        # how its value has to be filtered.
+        self._placeholder_call = pnode.expression
         ph_expression = self.build_ast(pnode.expression)[0]
         # If the expression contained a macro that was parsed as a
         # fragment, the expression is now a statement and can be moved
@@ -536,6 +639,7 @@ class SemanticAnalyzer(object):
         registered_function = False
         function_has_only_literal_args = False
         never_cache = False
+        pure = False
         if isinstance(ph_expression, ast.CallFunctionNode):
             fname = ph_expression.expression.name
             if self.compiler.registry_contains(fname):
@@ -554,14 +658,35 @@ class SemanticAnalyzer(object):
                     fname, 'cache_forever')
                 never_cache = self.compiler.get_registry_value(fname,
                                                                'never_cache')
+                pure = self.compiler.get_registry_value(fname, 'pure')
 
             elif ph_expression.library_function:
                 # Don't escape function calls into library templates.
                 skip_filter = True
 
+        # pure functions are always folded, cache_forever functions only when
+        # asked to.
+        fold_call = pure or (self.options.fold_constant_placeholders and
+                             cache_forever and function_has_only_literal_args
+                             and not never_cache)
+        filter_literal = False
+        if fold_call and format_string == default_format_string:
+            folded = self.fold_function_call(ph_expression)
+            if folded is not None:
+                function, ph_expression = folded
+                # the filter that applies at runtime can come from a base
+                # template's #filter or the default_filter argument, so the
+                # folded value is still filtered unless it never would be.
+                skip_filter = skip_filter or getattr(function, 'skip_filter',
+                                                     False)
+                filter_literal = not skip_filter
+        if pure and not isinstance(ph_expression, ast.LiteralNode):
+            self.template.used_function_registry_identifiers.add(fname)
+
         if (self.compiler.enable_filters and
                 format_string == default_format_string and
-                not isinstance(ph_expression, ast.LiteralNode)):
+            (filter_literal or
+             not isinstance(ph_expression, ast.LiteralNode))):
             arg_node_map = pnode.parameter_list.get_arg_node_map()
             if 'raw' in arg_map:
                 # If this is a |raw usage and the template does not allow raw,
@@ -600,8 +725,8 @@ class SemanticAnalyzer(object):
                                                      pos=pnode.pos)
                     self.template.cached_identifiers.add(cache_expression)
                     node_list.append(cache_expression)
-                    ph_expression = ast.IdentifierNode(cache_expression.name,
-                                                       pos=pnode.pos)
+                    ph_expression = ast.IdentifierNode(
+                        cache_expression.local_name, pos=pnode.pos)
 
         if isinstance(ph_expression, ast.LiteralNode):
             buffer_write = ast.BufferWrite(ph_expression, pos=pnode.pos)
@@ -621,6 +746,78 @@ class SemanticAnalyzer(object):
             node_list.append(buffer_write)
         return node_list
 
+    def get_constant_args(self, arg_list):
+        """Return (args, kwargs) for an argument list made only of literals,
+        or None if any argument has to be evaluated at runtime."""
+        args = []
+        kwargs = {}
+        for arg in arg_list:
+            if isinstance(arg, ast.LiteralNode):
+                if kwargs:
+                    return None
+                args.append(arg.value)
+            elif (isinstance(arg, ast.ParameterNode) and
+                  isinstance(arg.default, ast.LiteralNode)):
+                kwargs[arg.name] = arg.default.value
+            else:
+                return None
+        return args, kwargs
+
+    def call_constant_function(self, call_node):
+        """Call a registry function with its literal arguments at compile time.
+
+        Returns (function, value). Raises if the arguments are not constant or
+        the call fails.
+        """
+        fname = call_node.expression.name
+        constant_args = self.get_constant_args(call_node.arg_list)
+        if constant_args is None:
+            raise ValueError('non-constant arguments to %s' % fname)
+        args, kwargs = constant_args
+        function = runtime.import_module_symbol(
+            self.compiler.function_name_registry[fname][0])
+        return function, function(*args, **kwargs)
+
+    def fold_pure_call(self, call_node):
+        """Replace a call to a pure registry function with a LiteralNode.
+
+        Only values that can be written back out as python literals are
+        inlined; None is returned if the call can't be folded.
+        """
+        if self.template.baked:
+            return None
+        try:
+            function, value = self.call_constant_function(call_node)
+            if isinstance(value, str):
+                # the literal is encoded with the template encoding in
+                # codegen, so only plain ascii byte strings are safe.
+                value.decode('ascii')
+            elif not isinstance(value, _pure_literal_types):
+                return None
+            elif isinstance(value, float) and (math.isinf(value) or
+                                               math.isnan(value)):
+                # inf and nan have no literal spelling.
+                return None
+        except Exception:
+            # anything that goes wrong will happen at runtime instead.
+            return None
+        return ast.LiteralNode(value, pos=call_node.pos)
+
+    # call a function from the registry on literal arguments, returning the
+    # function and a LiteralNode for the output or None if that can't be done
+    # safely at compile time.
+    def fold_function_call(self, call_node):
+        if self.template.baked:
+            return None
+        try:
+            function, value = self.call_constant_function(call_node)
+            if not isinstance(value, basestring):
+                return None
+        except Exception:
+            # anything that goes wrong will happen at runtime instead.
+            return None
+        return function, ast.LiteralNode(value, pos=call_node.pos)
+
     def analyzePlaceholderNode(self, pnode):
         if (self.options.fail_library_searchlist_access and
                 pnode.name not in self.template.global_placeholders):
@@ -686,7 +883,10 @@ class SemanticAnalyzer(object):
         fn = pnode
 
         fname = fn.expression.name
-        if self.compiler.registry_contains(fname):
+        # Calls to pure functions are only marked once we know they could not
+        # be folded away.
+        pure = self.compiler.get_registry_value(fname, 'pure')
+        if self.compiler.registry_contains(fname) and not pure:
             # If this is a placeholder that is in the function registry, mark it
             # as used so that in the optimizer stage, we can avoid importing
             # unused registry values.
@@ -737,8 +937,20 @@ class SemanticAnalyzer(object):
             fn.sanitization_state = ast.SanitizedState.SANITIZED_STRING
             fn.library_function = True
 
+        is_placeholder_call = pnode is self._placeholder_call
+        self._placeholder_call = None
         fn.expression = self.build_ast(fn.expression)[0]
         fn.arg_list = self.build_ast(fn.arg_list)[0]
+        if pure and not is_placeholder_call:
+            folded_node = self.fold_pure_call(fn)
+            if folded_node is not None:
+                return [folded_node]
+            self.template.used_function_registry_identifiers.add(fname)
+        if (self.compiler.get_registry_value(fname, 'memoize_per_render') and
+                not [arg for arg in fn.arg_list
+                     if isinstance(arg, ast.ParameterNode)]):
+            # Results are cached by the tuple of positional arguments.
+            fn.memoize = True
         return [fn]
 
     analyzeBufferWrite = analyzeCallFunctionNode
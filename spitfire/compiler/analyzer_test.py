@@ -610,5 +610,176 @@ class TestNoRaw(BaseTest):
                           semantic_analyzer.get_ast)
 
 
+class TestFoldConstantPlaceholders(BaseTest):
+
+    def setUp(self):
+        self.analyzer_options = options.AnalyzerOptions(
+            fold_constant_placeholders=True)
+        self.compiler = compiler.Compiler(
+            analyzer_options=self.analyzer_options,
+            xspt_mode=False,
+            compiler_stack_traces=True)
+        self.compiler.new_registry_format = True
+        self.compiler.function_name_registry['join'] = ('os.path.join',
+                                                        ['cache_forever'])
+        self.compiler.function_name_registry['upper'] = ('string.upper', [
+            'cache_forever', 'skip_filter'
+        ])
+
+    def _get_writes(self, code):
+        analyzed_ast = self._get_analyzer(self._compile(code)).get_ast()
+        return [node.expression.value
+                for node in walker.flatten_tree(analyzed_ast)
+                if isinstance(node, ast.BufferWrite) and
+                isinstance(node.expression, ast.LiteralNode)]
+
+    def test_filtered_not_folded(self):
+        # the filter is only known at runtime.
+        self.assertEqual(self._get_writes('$join("x", "y")'), [])
+
+    def test_fold_skip_filter(self):
+        self.assertIn('Q', self._get_writes('$upper("q")'))
+
+    def test_fold_raw(self):
+        self.assertIn('x/y', self._get_writes('${join("x", "y")|raw}'))
+
+    def test_non_literal_args_not_folded(self):
+        self.assertEqual(self._get_writes('$upper($x)'), [])
+
+    def test_filter_directive(self):
+        self.assertEqual(
+            self._get_writes('#filter escape_html\n$join("x", "y")'), [])
+        self.assertIn('Q', self._get_writes(
+            '#filter escape_html\n$upper("q")'))
+
+    def test_error_not_folded(self):
+        self.assertEqual(self._get_writes('$upper(1)'), [])
+
+
+class TestCacheBlock(BaseTest):
+
+    def _analyze(self, code):
+        return self._get_analyzer(self._compile(code)).get_ast()
+
+    def test_cache_block(self):
+        analyzed_ast = self._analyze('#cache key=$x ttl=60\n$x\n#end cache\n')
+        nodes = walker.flatten_tree(analyzed_ast)
+        self.assertEqual(
+            [n.name for n in nodes if isinstance(n, ast.CaptureStartNode)],
+            ['_fragment_buffer_1'])
+        self.assertEqual(
+            [n.target for n in nodes if isinstance(n, ast.CaptureEndNode)],
+            ['_fragment_1'])
+
+    def test_empty_cache_block_fails(self):
+        self.assertRaises(analyzer.SemanticAnalyzerError, self._analyze,
+                          '#cache key=$x\n#end cache\n')
+
+    def test_unknown_parameter_fails(self):
+        self.assertRaises(analyzer.SemanticAnalyzerError, self._analyze,
+                          '#cache timeout=60\nx\n#end cache\n')
+
+    def test_break_fails(self):
+        self.assertRaises(
+            analyzer.SemanticAnalyzerError, self._analyze,
+            '#for $i in $x\n#cache\n#if $i\n#break\n#end if\n'
+            '#end cache\n#end for\n')
+
+    def test_break_in_nested_loop(self):
+        self._analyze('#cache\n#for $i in $x\n#break\n#end for\n#end cache\n')
+
+
+class TestPureFunctions(BaseTest):
+
+    def setUp(self):
+        self.analyzer_options = options.AnalyzerOptions()
+        self.compiler = compiler.Compiler(
+            analyzer_options=self.analyzer_options,
+            xspt_mode=False,
+            compiler_stack_traces=True)
+        self.compiler.new_registry_format = True
+        self.compiler.function_name_registry['join'] = ('os.path.join',
+                                                        ['pure'])
+        self.compiler.function_name_registry['split'] = ('os.path.split', [])
+
+    def _get_ast(self, code):
+        return walker.flatten_tree(self._get_analyzer(self._compile(
+            code)).get_ast())
+
+    def _get_literals(self, code):
+        return [node.value for node in self._get_ast(code)
+                if isinstance(node, ast.LiteralNode)]
+
+    def _get_calls(self, code):
+        return [node.expression.name for node in self._get_ast(code)
+                if isinstance(node, ast.CallFunctionNode) and
+                self.compiler.registry_contains(node.expression.name)]
+
+    def test_fold_assign(self):
+        code = '#set $p = $join("x", "y")\n'
+        self.assertIn('x/y', self._get_literals(code))
+        self.assertEqual(self._get_calls(code), [])
+
+    def test_fold_nested(self):
+        code = '#set $p = $join($join("x", "y"), "z")\n'
+        self.assertIn('x/y/z', self._get_literals(code))
+        self.assertEqual(self._get_calls(code), [])
+
+    def test_fold_argument(self):
+        code = '#set $p = $split($join("x", "y"))\n'
+        self.assertIn('x/y', self._get_literals(code))
+        self.assertEqual(self._get_calls(code), ['split'])
+
+    def test_fold_keyword_argument(self):
+        self.compiler.function_name_registry['replace'] = ('string.replace',
+                                                           ['pure'])
+        code = '#set $p = $replace("a-b-c", "-", "/", maxreplace=1)\n'
+        self.assertIn('a/b-c', self._get_literals(code))
+        self.assertEqual(self._get_calls(code), [])
+
+    def test_fold_placeholder(self):
+        self.assertIn('x/y', self._get_literals('${join("x", "y")|raw}'))
+        self.assertEqual(self._get_calls('${join("x", "y")|raw}'), [])
+
+    def test_fold_filtered_placeholder(self):
+        semantic_analyzer = self._get_analyzer(self._compile(
+            '$join("x", "y")'))
+        semantic_analyzer.call_constant_function = test_util.RecordedFunction(
+            semantic_analyzer.call_constant_function)
+        nodes = walker.flatten_tree(semantic_analyzer.get_ast())
+        self.assertEqual(
+            len(semantic_analyzer.call_constant_function.GetCalls()), 1)
+        # filtered output is still filtered at runtime.
+        self.assertEqual([node.expression for node in nodes
+                          if isinstance(node, ast.FilterNode)],
+                         [ast.LiteralNode('x/y')])
+        self.assertNotIn('join', [node.expression.name for node in nodes
+                                  if isinstance(node, ast.CallFunctionNode)
+                                  and hasattr(node.expression, 'name')])
+
+    def test_non_literal_args_not_folded(self):
+        code = '#set $p = $join($x, "y")\n'
+        self.assertEqual(self._get_calls(code), ['join'])
+
+    def test_not_pure_not_folded(self):
+        code = '#set $p = $split("x/y")\n'
+        self.assertEqual(self._get_calls(code), ['split'])
+
+    def test_unsupported_result_not_folded(self):
+        # tuples have no LiteralNode representation.
+        self.compiler.function_name_registry['split'] = ('os.path.split',
+                                                         ['pure'])
+        code = '#set $p = $split("x/y")\n'
+        self.assertEqual(self._get_calls(code), ['split'])
+
+    def test_non_finite_float_not_folded(self):
+        self.compiler.function_name_registry['float'] = ('__builtin__.float',
+                                                         ['pure'])
+        self.assertEqual(self._get_calls('#set $p = $float("1.5")\n'), [])
+        for value in ('inf', '-inf', 'nan'):
+            code = '#set $p = $float("%s")\n' % value
+            self.assertEqual(self._get_calls(code), ['float'])
+
+
 if __name__ == '__main__':
     unittest.main()
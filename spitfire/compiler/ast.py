@@ -325,6 +325,8 @@ class CallFunctionNode(ASTNode):
         # What the current sanitized state is of the function call.
         # See SanitizedState.
         self.sanitization_state = SanitizedState.UNKNOWN
+        # Whether the result is memoized on the template instance.
+        self.memoize = False
         if arg_list:
             self.arg_list = arg_list
         else:
@@ -374,6 +376,9 @@ class CacheNode(CallFunctionNode):
     def __init__(self, expression=None, pos=None):
         ASTNode.__init__(self, '_cph%08X' % unsigned_hash(expression), pos=pos)
         self.expression = expression
+        # the local the value is read from. the store may reset the global to
+        # None before the function is done with it.
+        self.local_name = '_cpl%08X' % unsigned_hash(expression)
 
     def __eq__(self, node):
         return bool(type(self) == type(node) and self.expression ==
@@ -550,6 +555,33 @@ class StripLinesNode(ASTNode):
     codegen stage."""
 
 
+class CacheBlockNode(ASTNode):
+    """A #cache region. The analyzer turns it into a lookup in the fragment
+    cache that renders the region into a captured buffer on a miss."""
+
+    def __init__(self, pos=None):
+        ASTNode.__init__(self, pos=pos)
+        self.parameter_list = ParameterListNode()
+
+    def __str__(self):
+        return '%s parameter_list:%r' % (self.__class__.__name__,
+                                         self.parameter_list)
+
+
+class CaptureStartNode(ASTNode):
+    """Send output to a new buffer until the next CaptureEndNode. The current
+    buffer is kept in the variable called name."""
+
+
+class CaptureEndNode(ASTNode):
+    """Assign the captured output to the variable called target and go back to
+    writing to the buffer saved in the variable called name."""
+
+    def __init__(self, name, target, pos=None):
+        ASTNode.__init__(self, name, pos=pos)
+        self.target = target
+
+
 class FunctionNode(ASTNode):
 
     def __init__(self, *pargs, **kargs):
@@ -598,7 +630,12 @@ class GetAttrNode(ASTNode):
 
 
 class GetUDNNode(GetAttrNode):
-    pass
+
+    def __init__(self, expression, name, pos=None):
+        GetAttrNode.__init__(self, expression, name, pos=pos)
+        # Whether the expression is known to be a dict, so the name can be
+        # looked up as a key before falling back to resolve_udn.
+        self.dict_lookup = False
 
 
 class IdentifierNode(ASTNode):
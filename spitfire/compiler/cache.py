@@ -0,0 +1,193 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+"""A content-addressed, on-disk cache of generated template code.
+
+Compiling a template is a pure function of the template source, the effective
+analyzer options, a handful of compiler settings, the function registry, the
+code of any registry functions that can be called at compile time and the
+version of spitfire doing the compiling. The cache hashes all of those
+inputs into a key and stores the generated python source under that key, so
+an unchanged template can skip the parse/analyze/optimize/codegen pipeline
+entirely.
+"""
+
+import hashlib
+import inspect
+import os
+import os.path
+import sys
+import tempfile
+
+import spitfire
+from spitfire import runtime
+from spitfire.compiler import optimizer
+
+# Compiler settings that change the generated code but are not stored on the
+# analyzer options.
+_KEY_SETTING_NAMES = (
+    'base_extends_package',
+    'enable_filters',
+    'locale',
+    'xspt_mode',
+)
+
+
+def _read_file(path):
+    f = open(path, 'rb')
+    try:
+        return f.read()
+    finally:
+        f.close()
+
+
+def _get_foldable_function_paths(spt_compiler):
+    # registry functions the analyzer may call at compile time and fold into
+    # the generated code.
+    fold_cache_forever = (
+        spt_compiler.analyzer_options.fold_constant_placeholders)
+    for fname in sorted(spt_compiler.function_name_registry):
+        if (spt_compiler.get_registry_value(fname, 'pure') or
+                (fold_cache_forever and
+                 spt_compiler.get_registry_value(fname, 'cache_forever'))):
+            yield spt_compiler.function_name_registry[fname][0]
+
+
+def _get_function_module_source(function_path):
+    # a folded value depends on the function and anything it calls, so use
+    # the source of the whole module it's defined in.
+    try:
+        function = runtime.import_module_symbol(function_path)
+        module = sys.modules[function.__module__]
+        return _read_file(inspect.getsourcefile(module) or module.__file__)
+    except Exception:
+        # builtins have no source, and a function that can't be imported
+        # isn't folded.
+        return ''
+
+
+class _Hasher(object):
+    """Hashes a sequence of values, length prefixing each one so adjacent
+    values can't run together."""
+
+    def __init__(self):
+        self._sha1 = hashlib.sha1()
+
+    def add(self, value):
+        if isinstance(value, unicode):
+            value = value.encode('utf8')
+        else:
+            value = str(value)
+        self._sha1.update('%d:' % len(value))
+        self._sha1.update(value)
+
+    def hexdigest(self):
+        return self._sha1.hexdigest()
+
+
+def get_compiler_fingerprint(spt_compiler):
+    """Hash everything about spt_compiler that affects the generated code.
+
+    This covers the spitfire version, the effective analyzer options, the
+    compiler settings that aren't analyzer options, the contents of the
+    function registry and message catalogue files and the source of the
+    modules defining registry functions that can be folded at compile time.
+    """
+    hasher = _Hasher()
+    hasher.add(spitfire.__version__)
+    for name, value in sorted(vars(spt_compiler.analyzer_options).iteritems()):
+        hasher.add(name)
+        hasher.add(repr(value))
+    for name in _KEY_SETTING_NAMES:
+        hasher.add(name)
+        hasher.add(repr(getattr(spt_compiler, name, None)))
+    for path in (spt_compiler.function_registry_file,
+                 spt_compiler.message_catalogue_file):
+        if path:
+            hasher.add(_read_file(path))
+        else:
+            hasher.add('')
+    for function_path in _get_foldable_function_paths(spt_compiler):
+        hasher.add(function_path)
+        hasher.add(_get_function_module_source(function_path))
+    return hasher.hexdigest()
+
+
+def get_cache_key(spt_compiler, src_text, classname):
+    """Compute the cache key for compiling src_text with spt_compiler.
+
+    Args:
+        spt_compiler: The compiler.Compiler that would compile the template.
+        src_text: The template source text.
+        classname: The name of the generated template class.
+
+    Returns:
+        A hex digest string, or None if the inputs can't be fingerprinted and
+        the template should be compiled without consulting the cache.
+    """
+    hasher = _Hasher()
+    hasher.add(get_compiler_fingerprint(spt_compiler))
+    hasher.add(classname)
+    hasher.add(src_text)
+
+    # with dependency analysis enabled, the generated code depends on which
+    # functions the base templates define.
+    if spt_compiler.analyzer_options.use_dependency_analysis:
+        for line in src_text.splitlines():
+            match = optimizer.extends_re.match(line)
+            if not match:
+                continue
+            path = match.group(1).replace('.', '/')
+            try:
+                function_cache = spt_compiler.template_function_cache
+                function_names = function_cache.get_template_functions(
+                    spt_compiler.include_path, path)
+            except Exception:
+                # let the compiler report the missing base template.
+                return None
+            hasher.add(path)
+            hasher.add(' '.join(sorted(function_names)))
+    return hasher.hexdigest()
+
+
+class CompileCache(object):
+    """Stores generated python source code in a directory, keyed by hash."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.py')
+
+    def get(self, key):
+        """Return the cached source code for key, or None on a miss."""
+        try:
+            return _read_file(self._get_path(key))
+        except IOError:
+            return None
+
+    def put(self, key, src_code):
+        path = self._get_path(key)
+        dirname = os.path.dirname(path)
+        if not os.path.isdir(dirname):
+            try:
+                os.makedirs(dirname)
+            except OSError:
+                # another compiler process may have created it first.
+                if not os.path.isdir(dirname):
+                    raise
+        # write to a temporary file and rename it so concurrent readers never
+        # see a partially written entry.
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            f = os.fdopen(fd, 'wb')
+            try:
+                f.write(src_code)
+            finally:
+                f.close()
+            os.rename(tmp_path, path)
+        except:
+            os.unlink(tmp_path)
+            raise
@@ -0,0 +1,117 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from spitfire.compiler import cache
+from spitfire.compiler import compiler
+from spitfire.compiler import options
+from spitfire import test_util
+
+
+class CompileCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+        self.template_path = os.path.join(self.temp_dir, 'tmpl.spt')
+        self._write_template('Hello $name!\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write_template(self, src_text, path=None):
+        f = open(path or self.template_path, 'w')
+        f.write(src_text)
+        f.close()
+
+    def _get_compiler(self, **kargs):
+        spt_compiler = compiler.Compiler(
+            analyzer_options=options.AnalyzerOptions(**kargs),
+            compile_cache_directory=self.cache_dir,
+            include_path=self.temp_dir,
+            compiler_stack_traces=True)
+        spt_compiler.compile_template = test_util.RecordedFunction(
+            spt_compiler.compile_template)
+        return spt_compiler
+
+    def test_hit(self):
+        first = self._get_compiler()
+        src_code = first.compile_file(self.template_path)
+        self.assertEqual(len(first.compile_template.GetCalls()), 1)
+
+        second = self._get_compiler()
+        self.assertEqual(second.compile_file(self.template_path), src_code)
+        self.assertEqual(second.compile_template.GetCalls(), [])
+
+    def test_source_change_misses(self):
+        self._get_compiler().compile_file(self.template_path)
+        self._write_template('Goodbye $name!\n')
+        spt_compiler = self._get_compiler()
+        src_code = spt_compiler.compile_file(self.template_path)
+        self.assertEqual(len(spt_compiler.compile_template.GetCalls()), 1)
+        self.assertIn('Goodbye', src_code)
+
+    def test_option_change_misses(self):
+        self._get_compiler().compile_file(self.template_path)
+        spt_compiler = self._get_compiler(generate_unicode=False)
+        spt_compiler.compile_file(self.template_path)
+        self.assertEqual(len(spt_compiler.compile_template.GetCalls()), 1)
+
+    def test_base_template_change_misses(self):
+        base_path = os.path.join(self.temp_dir, 'base.spt')
+        self._write_template('#def header\n#end def\n', path=base_path)
+        self._write_template('#extends base\n$header\n')
+        self._get_compiler(use_dependency_analysis=True).compile_file(
+            self.template_path)
+
+        self._write_template('#def title\n#end def\n', path=base_path)
+        spt_compiler = self._get_compiler(use_dependency_analysis=True)
+        spt_compiler.compile_file(self.template_path)
+        self.assertEqual(len(spt_compiler.compile_template.GetCalls()), 1)
+
+    def test_folded_function_change_misses(self):
+        # pure functions are called at compile time, so the generated code
+        # depends on their source.
+        module_path = os.path.join(self.temp_dir, 'cache_test_functions.py')
+        self._write_template('def greet():\n    return "hello"\n',
+                             path=module_path)
+        sys.path.insert(0, self.temp_dir)
+        self.addCleanup(sys.path.remove, self.temp_dir)
+        self.addCleanup(sys.modules.pop, 'cache_test_functions', None)
+        spt_compiler = self._get_compiler()
+        spt_compiler.new_registry_format = True
+        spt_compiler.function_name_registry['greet'] = (
+            'cache_test_functions.greet', ['pure'])
+        src_text = '$greet()\n'
+        cache_key = cache.get_cache_key(spt_compiler, src_text, 'tmpl')
+
+        self._write_template('def greet():\n    return "goodbye"\n',
+                             path=module_path)
+        self.assertNotEqual(
+            cache.get_cache_key(spt_compiler, src_text, 'tmpl'), cache_key)
+
+    def test_warnings_skip_cache(self):
+        # warnings are reported while compiling, so a hit would drop them.
+        self._get_compiler().compile_file(self.template_path)
+        spt_compiler = self._get_compiler()
+        spt_compiler.enable_warnings = True
+        spt_compiler.compile_file(self.template_path)
+        self.assertEqual(len(spt_compiler.compile_template.GetCalls()), 1)
+
+    def test_missing_base_template_is_not_cached(self):
+        self._write_template('#extends missing\n')
+        spt_compiler = self._get_compiler(use_dependency_analysis=True)
+        self.assertEqual(
+            cache.get_cache_key(spt_compiler, '#extends missing\n', 'tmpl'),
+            None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -57,6 +57,12 @@ class CodeGenerator(object):
         # onto the stack and when we leave that function, we pop it from
         # the stack.
         self.function_stack = []
+        # The iterator and buffer alias state of the function outside of each
+        # CaptureStartNode we're inside.
+        self.capture_stack = []
+        # (cache name, udn name) for each resolve_udn call site that gets an
+        # inline cache.
+        self.udn_inline_caches = []
         self.options = options
         self.output = StringIO.StringIO()
         self.template = None
@@ -81,10 +87,11 @@ class CodeGenerator(object):
                     self.output.write(self.indent_str * indent_level)
                     self.output.write(code_node.src_line)
                     if (self.options.include_sourcemap and
-                            code_node.input_pos and self.compiler.src_line_map):
+                            code_node.input_pos and
+                            self.compiler.src_line_index is not None):
                         self.output.write(
-                            ' # L%s' %
-                            self.compiler.src_line_map[code_node.input_pos])
+                            ' # L%s' % self.compiler.src_line_index.get_line(
+                                code_node.input_pos))
                 self.output.write('\n')
         except AttributeError:
             self.compiler.error(CodegenError("can't write code_node: %s" %
@@ -108,20 +115,27 @@ class CodeGenerator(object):
             module_code.append_line('# Baked Mode')
             self.baked_mode = True
         module_code.append_line('')
-        if node.import_nodes:
-            module_code.append_line('# template imports')
-            for n in node.import_nodes:
-                module_code.extend(self.build_code(n))
-            module_code.append_line('')
-        if node.from_nodes:
-            module_code.append_line('# template from imports')
-            for n in node.from_nodes:
-                module_code.extend(self.build_code(n))
-            module_code.append_line('')
+        if self.options and self.options.lazy_imports:
+            module_code.extend(self.generate_lazy_imports(node))
+        else:
+            if node.import_nodes:
+                module_code.append_line('# template imports')
+                for n in node.import_nodes:
+                    module_code.extend(self.build_code(n))
+                module_code.append_line('')
+            if node.from_nodes:
+                module_code.append_line('# template from imports')
+                for n in node.from_nodes:
+                    module_code.extend(self.build_code(n))
+                module_code.append_line('')
 
         classname = node.classname
 
         module_code.append_line('import spitfire.runtime')
+        if node.cached_identifiers:
+            module_code.append_line('import spitfire.runtime.cache')
+        if self.options and self.options.bytes_output:
+            module_code.append_line('import spitfire.runtime.filters')
         module_code.append_line('import spitfire.runtime.template')
 
         if self.options and self.options.cheetah_cheats:
@@ -137,6 +151,8 @@ class CodeGenerator(object):
                                     'import resolve_placeholder_with_locals')
             module_code.append_line(
                 'from spitfire.runtime.udn import resolve_udn')
+        # the inline caches are only known once the methods are built.
+        udn_import_index = len(module_code.child_nodes)
 
         module_code.append_line(
             'from spitfire.runtime.baked import SanitizedPlaceholder')
@@ -149,10 +165,18 @@ class CodeGenerator(object):
         module_code.append_line('')
 
         if node.cached_identifiers:
+            cached_names = sorted(set([cached_ph.name
+                                       for cached_ph in node.cached_identifiers
+                                      ]))
             module_code.append_line('# cached identifiers')
-            for cached_ph in node.cached_identifiers:
-                module_code.append_line('%s = None' % cached_ph.name)
+            for cached_name in cached_names:
+                module_code.append_line('%s = None' % cached_name)
+            module_code.append_line(
+                '_cached_identifiers = '
+                'spitfire.runtime.cache.CachedIdentifierStore(globals(), %r)' %
+                (tuple(cached_names),))
             module_code.append_line('')
+        udn_inline_cache_index = len(module_code.child_nodes)
 
         if not node.library:
             extends = []
@@ -180,6 +204,15 @@ class CodeGenerator(object):
                                   vars())
 
             module_code.append(class_code)
+            if (self.options and self.options.bytes_output and
+                    not node.extends_nodes and
+                    not [n for n in node.attr_nodes
+                         if isinstance(n, ast.FilterAttributeNode)]):
+                # templates that extend this one inherit the filter.
+                class_code.append_line(
+                    '_filter_function = staticmethod('
+                    'spitfire.runtime.filters.utf8_str_filter)')
+                class_code.append_line('')
             for n in node.attr_nodes:
                 class_code.extend(self.build_code(n))
                 class_code.append_line('')
@@ -207,10 +240,85 @@ class CodeGenerator(object):
         #                   self.ast_root.source_path)
         #   logging.warning("%s", flatten_tree(node.main_function))
 
+        if self.udn_inline_caches:
+            # insert the later lines first so the import index still holds.
+            if self.options.raise_udn_exceptions:
+                cache_args = ', raise_exception=True'
+            else:
+                cache_args = ''
+            cache_code = [CodeNode('# udn inline caches')]
+            for cache_name, udn_name in self.udn_inline_caches:
+                cache_code.append(CodeNode(
+                    "%s = make_udn_inline_cache('%s'%s)" % (cache_name,
+                                                           udn_name,
+                                                           cache_args)))
+            cache_code.append(CodeNode(''))
+            module_code.child_nodes[udn_inline_cache_index:
+                                    udn_inline_cache_index] = cache_code
+            module_code.insert(udn_import_index, CodeNode(
+                'from spitfire.runtime.udn import make_udn_inline_cache'))
+
         module_code.append_line(run_tmpl % vars(node))
 
         return [module_code]
 
+    def generate_lazy_imports(self, node):
+        code_nodes = []
+        if not (node.import_nodes or node.from_nodes):
+            return code_nodes
+        code_nodes.append(CodeNode('import spitfire.runtime.lazy'))
+        code_nodes.append(CodeNode(''))
+        # the class statement needs the base classes right away, so the modules
+        # they live in (and anything else bound to the same top level name)
+        # are imported as usual.
+        # python 2 identifiers are ascii, and __import__ wants str names.
+        eager_module_names = set(
+            str('.'.join([n.name for n in extends_node.module_name_list[:-1]]))
+            for extends_node in node.extends_nodes)
+        eager_top_names = set(name.split('.')[0]
+                              for name in eager_module_names)
+        lazy_module_names = {}
+        lazy_top_names = []
+        if node.import_nodes:
+            code_nodes.append(CodeNode('# template imports'))
+            for n in node.import_nodes:
+                module_name = str('.'.join([i.name
+                                            for i in n.module_name_list]))
+                top_name = module_name.split('.')[0]
+                if top_name in eager_top_names:
+                    code_nodes.extend(self.build_code(n))
+                    continue
+                if top_name not in lazy_module_names:
+                    lazy_module_names[top_name] = []
+                    lazy_top_names.append(top_name)
+                lazy_module_names[top_name].append(module_name)
+            for top_name in lazy_top_names:
+                code_nodes.append(CodeNode(
+                    '%s = spitfire.runtime.lazy.LazyModule(globals(), %r, %r)' %
+                    (top_name, top_name, tuple(lazy_module_names[top_name]))))
+            code_nodes.append(CodeNode(''))
+        if node.from_nodes:
+            code_nodes.append(CodeNode('# template from imports'))
+            for n in node.from_nodes:
+                module_name = str('.'.join([i.name
+                                            for i in n.module_name_list]))
+                name = str((n.alias or n.identifier).name)
+                # a proxy only behaves like the object it stands in for when
+                # it's called, so only function registry imports are lazy.
+                # anything else imported with #from can be used as a plain
+                # value and is imported as usual.
+                fq_name = '%s.%s' % (module_name, n.identifier.name)
+                registry_entry = self.compiler.function_name_registry.get(name)
+                if not registry_entry or registry_entry[0] != fq_name:
+                    code_nodes.extend(self.build_code(n))
+                    continue
+                code_nodes.append(CodeNode(
+                    '%s = spitfire.runtime.lazy.LazySymbol('
+                    'globals(), %r, %r, %r)' %
+                    (name, name, module_name, str(n.identifier.name))))
+            code_nodes.append(CodeNode(''))
+        return code_nodes
+
     def codegenASTExtendsNode(self, node):
         return [CodeNode('.'.join([
             self.generate_python(self.build_code(n)[
@@ -260,7 +368,12 @@ class CodeGenerator(object):
             arg_list = self.generate_python(self.build_code(node.arg_list)[0])
         else:
             arg_list = ''
-        call = ASTCallFunctionNode_tmpl[0] % vars()
+        if node.memoize:
+            self.function_stack[-1].uses_memoize_call = True
+            call = '_self_memoize_call(%s)' % ', '.join(
+                [a for a in (expression, arg_list) if a])
+        else:
+            call = ASTCallFunctionNode_tmpl[0] % vars()
         if self.baked_mode:
             sanitization_state = node.sanitization_state
             # For SANITIZED_STRING we could use SanitizedPlaceholder(), but the
@@ -387,14 +500,22 @@ class CodeGenerator(object):
         if (self.options and self.options.default_to_strict_resolution and
                 self.template and not self.template.use_loose_resolution):
             return [CodeNode("%(expression)s.%(name)s" % vars())]
-        if self.options and self.options.raise_udn_exceptions:
-            return [CodeNode(
+        if (self.options and self.options.udn_inline_caches and
+                not self.options.cheetah_cheats):
+            cache_name = '_udn_ic_%d' % len(self.udn_inline_caches)
+            self.udn_inline_caches.append((cache_name, name))
+            resolve = '%(cache_name)s(%(expression)s)' % vars()
+        elif self.options and self.options.raise_udn_exceptions:
+            resolve = (
                 "resolve_udn(%(expression)s, '%(name)s', raise_exception=True)"
-                % vars(),
-                input_pos=node.pos)]
+                % vars())
         else:
-            return [CodeNode("resolve_udn(%(expression)s, '%(name)s')" % vars(),
-                             input_pos=node.pos)]
+            resolve = "resolve_udn(%(expression)s, '%(name)s')" % vars()
+        if node.dict_lookup:
+            resolve = ("(%(expression)s['%(name)s'] "
+                       "if '%(name)s' in %(expression)s else %(resolve)s)" %
+                       vars())
+        return [CodeNode(resolve, input_pos=node.pos)]
 
     def codegenASTPlaceholderNode(self, node):
         name = node.name
@@ -416,6 +537,10 @@ class CodeGenerator(object):
                              input_pos=node.pos)]
 
     def codegenASTReturnNode(self, node):
+        if self.function_stack and self.function_stack[-1].generating_iterator:
+            # generators can't return a value, and the only return nodes are
+            # the ones that end a function early with an empty string.
+            return [CodeNode('return', input_pos=node.pos)]
         expression = self.generate_python(self.build_code(node.expression)[0])
         return [CodeNode("return %(expression)s" % vars(), input_pos=node.pos)]
 
@@ -460,18 +585,38 @@ class CodeGenerator(object):
                          input_pos=node.pos)]
 
     def codegenASTFunctionNode(self, node):
+        code_nodes = self.generate_function(node)
+        if self.options and self.options.generate_iterators:
+            code_nodes.append(CodeNode(''))
+            code_nodes.extend(self.generate_function(node, iterator=True))
+        return code_nodes
+
+    # iterator - generate <name>_iter, which yields chunks of output instead
+    # of writing them into a buffer and returning the result.
+    def generate_function(self, node, iterator=False):
         name = node.name
+        if iterator:
+            name += '_iter'
         node.uses_globals = False
         node.uses_filter_function = False
         node.uses_private_filter_function = False
+        node.uses_memoize_call = False
         node.uses_buffer_write = False
         node.uses_buffer_extend = False
+        node.generating_iterator = iterator
+        node.uses_yield = False
+        node.shares_buffer = bool(
+            not iterator and self.options and self.options.share_buffers and
+            not self.options.cheetah_compatibility and
+            not self.template.library)
         self.function_stack.append(node)
         if node.parameter_list:
             parameter_list = self.generate_python(self.build_code(
                 node.parameter_list)[0])
         else:
             parameter_list = ''
+        if node.shares_buffer:
+            parameter_list += ', _buffer=None'
 
         decorator_node = CodeNode('@template_method')
         # NOTE: for Cheetah compatibility, we have to handle the case where
@@ -492,7 +637,11 @@ class CodeGenerator(object):
         needs_globals_added = True
         child_nodes = node.child_nodes
 
-        if self.options and self.options.cheetah_compatibility:
+        if iterator:
+            # a generator's body doesn't run until the first chunk is asked
+            # for, so there's nothing to gain by testing a lone #if early.
+            pass
+        elif self.options and self.options.cheetah_compatibility:
             if_cheetah = CodeNode("if 'trans' in kargs:")
             code_node.append(if_cheetah)
             if_cheetah.append(CodeNode("_buffer = kargs['trans'].response()"))
@@ -525,7 +674,13 @@ class CodeGenerator(object):
                         code_node.append(CodeNode('_globals = globals()'))
                     code_node.extend(new_code)
 
-            code_node.append(CodeNode('_buffer = self.new_buffer()'))
+            if node.shares_buffer:
+                code_node.append(CodeNode('_return_buffer = _buffer is None'))
+                if_no_buffer = CodeNode('if _return_buffer:')
+                if_no_buffer.append(CodeNode('_buffer = self.new_buffer()'))
+                code_node.append(if_no_buffer)
+            else:
+                code_node.append(CodeNode('_buffer = self.new_buffer()'))
 
         # Save the point where _globals and self_filter_funtion will go if used.
         # We don't append these here because we have to determine if these two
@@ -558,6 +713,10 @@ class CodeGenerator(object):
             code_node.insert(insertion_point, CodeNode(
                 '_self_private_filter_function = self._filter_function'))
             insertion_point += 1
+        if node.uses_memoize_call:
+            code_node.insert(insertion_point,
+                             CodeNode('_self_memoize_call = self.memoize_call'))
+            insertion_point += 1
         if node.uses_buffer_write:
             code_node.insert(insertion_point,
                              CodeNode('_buffer_write = _buffer.write'))
@@ -565,10 +724,20 @@ class CodeGenerator(object):
         if node.uses_buffer_extend:
             code_node.insert(insertion_point,
                              CodeNode('_buffer_extend = _buffer.extend'))
-        if self.options.cheetah_compatibility:
+        if iterator:
+            if not node.uses_yield:
+                # without a yield this wouldn't be a generator function.
+                code_node.append(CodeNode('return iter(())'))
+        elif self.options.cheetah_compatibility:
             if_cheetah = CodeNode("if 'trans' not in kargs:")
             if_cheetah.append(CodeNode('return _buffer.getvalue()'))
             code_node.append(if_cheetah)
+        elif node.shares_buffer:
+            # the output is already in the caller's buffer.
+            if_return = CodeNode('if _return_buffer:')
+            if_return.append(CodeNode('return _buffer.getvalue()'))
+            code_node.append(if_return)
+            code_node.append(CodeNode("return ''"))
         else:
             code_node.append(CodeNode('return _buffer.getvalue()'))
         self.function_stack.pop()
@@ -580,27 +749,118 @@ class CodeGenerator(object):
     #def codegenASTReturnNode(self, node):
     #  code_node = self.codegenDefault(node)
 
+    # if node calls a template method and writes the result out as is, return
+    # the method's name and the code for its arguments.
+    def get_template_method_call(self, node):
+        if (type(node) is not ast.CallFunctionNode or
+                not isinstance(node.expression,
+                               ast.TemplateMethodIdentifierNode) or
+                self.baked_mode):
+            return None
+        if node.arg_list:
+            arg_list = self.generate_python(self.build_code(node.arg_list)[0])
+        else:
+            arg_list = ''
+        return node.expression.name, arg_list
+
+    def generate_yield(self, node):
+        self.function_stack[-1].uses_yield = True
+        # stream the output of template methods called directly, rather than
+        # waiting for them to build all of it.
+        template_method_call = self.get_template_method_call(node)
+        if template_method_call:
+            name, arg_list = template_method_call
+            code_node = CodeNode(
+                'for _chunk in self.%(name)s_iter(%(arg_list)s):' % vars(),
+                input_pos=node.pos)
+            code_node.append(CodeNode('yield _chunk'))
+            return [code_node]
+        expression = self.generate_output(node)
+        return [CodeNode('yield %(expression)s' % vars(), input_pos=node.pos)]
+
+    # generate the code for a value that is written to the output.
+    def generate_output(self, node):
+        if (self.options and self.options.bytes_output and
+                isinstance(node, ast.LiteralNode) and
+                isinstance(node.value, unicode)):
+            # encode text now rather than on every render.
+            return repr(node.value.encode('utf-8'))
+        return self.generate_python(self.build_code(node)[0])
+
+    # have a template method write straight into this function's buffer.
+    def generate_shared_buffer_call(self, node):
+        template_method_call = self.get_template_method_call(node)
+        if not template_method_call:
+            return None
+        name, arg_list = template_method_call
+        if arg_list:
+            arg_list += ', '
+        return CodeNode('self.%(name)s(%(arg_list)s_buffer=_buffer)' % vars(),
+                        input_pos=node.pos)
+
     def codegenASTBufferWrite(self, node):
+        if self.function_stack[-1].generating_iterator:
+            return self.generate_yield(node.expression)
+        if self.function_stack[-1].shares_buffer:
+            code_node = self.generate_shared_buffer_call(node.expression)
+            if code_node:
+                return [code_node]
         self.function_stack[-1].uses_buffer_write = True
-        expression = self.generate_python(self.build_code(node.expression)[0])
+        expression = self.generate_output(node.expression)
         code_node = CodeNode('_buffer_write(%(expression)s)' % vars(),
                              input_pos=node.pos)
         return [code_node]
 
     def codegenASTBufferExtend(self, node):
+        if self.function_stack[-1].generating_iterator:
+            code_nodes = []
+            for n in node.expression.child_nodes:
+                code_nodes.extend(self.generate_yield(n))
+            return code_nodes
+        if self.function_stack[-1].shares_buffer:
+            code_nodes = []
+            pending = []
+            for n in node.expression.child_nodes:
+                code_node = self.generate_shared_buffer_call(n)
+                if code_node:
+                    code_nodes.extend(self.generate_buffer_extend(pending))
+                    code_nodes.append(code_node)
+                    pending = []
+                else:
+                    pending.append(n)
+            if code_nodes:
+                code_nodes.extend(self.generate_buffer_extend(pending))
+                return code_nodes
         self.function_stack[-1].uses_buffer_extend = True
-        expression = self.generate_python(self.build_code(node.expression)[0])
+        expression = '(%s)' % ', '.join(
+            [self.generate_output(n) for n in node.expression.child_nodes])
         code_node = CodeNode('_buffer_extend(%(expression)s)' % vars(),
                              input_pos=node.pos)
         return [code_node]
 
+    def generate_buffer_extend(self, nodes):
+        if not nodes:
+            return []
+        expressions = [self.generate_output(n) for n in nodes]
+        if len(expressions) == 1:
+            self.function_stack[-1].uses_buffer_write = True
+            return [CodeNode('_buffer_write(%s)' % expressions[0],
+                             input_pos=nodes[0].pos)]
+        self.function_stack[-1].uses_buffer_extend = True
+        return [CodeNode('_buffer_extend((%s))' % ', '.join(expressions),
+                         input_pos=nodes[0].pos)]
+
     def codegenASTEchoNode(self, node):
-        self.function_stack[-1].uses_buffer_write = True
+        if self.function_stack[-1].generating_iterator:
+            write_tmpl = 'yield %s'
+            self.function_stack[-1].uses_yield = True
+        else:
+            write_tmpl = '_buffer_write(%s)'
+            self.function_stack[-1].uses_buffer_write = True
         node_list = []
 
-        true_expression = self.generate_python(self.build_code(
-            node.true_expression)[0])
-        true_code = CodeNode('_buffer_write(%(true_expression)s)' % vars())
+        true_expression = self.generate_output(node.true_expression)
+        true_code = CodeNode(write_tmpl % true_expression)
         if node.test_expression:
             test_expression = self.generate_python(self.build_code(
                 node.test_expression)[0])
@@ -611,26 +871,61 @@ class CodeGenerator(object):
             node_list.append(true_code)
 
         if node.false_expression:
-            false_expression = self.generate_python(self.build_code(
-                node.false_expression)[0])
+            false_expression = self.generate_output(node.false_expression)
             else_code = CodeNode('else:' % vars())
-            else_code.append(CodeNode('_buffer_write(%(false_expression)s)' %
-                                      vars()))
+            else_code.append(CodeNode(write_tmpl % false_expression))
             node_list.append(else_code)
         return node_list
 
     def codegenASTCacheNode(self, node):
-        self.function_stack[-1].uses_globals = True
         cached_name = node.name
+        local_name = node.local_name
         expression = self.generate_python(self.build_code(node.expression)[0])
-        # use dictionary syntax to get around coalescing 'global' statements
-        #globalize_var = CodeNode('global %(cached_name)s' % vars())
-        if_code = CodeNode("if %(cached_name)s is None:" % vars(),
+        # the store sets the module global, which gets around coalescing
+        # 'global' statements. the value is read from a local since setting
+        # another name can evict this one from the store.
+        assign_code = CodeNode('%(local_name)s = %(cached_name)s' % vars(),
+                               input_pos=node.pos)
+        if_code = CodeNode('if %(local_name)s is None:' % vars(),
                            input_pos=node.pos)
-        if_code.append(
-            CodeNode("_globals['%(cached_name)s'] = %(expression)s" % vars(),
-                     input_pos=node.pos))
-        return [if_code]
+        if_code.append(CodeNode(
+            "%(local_name)s = _cached_identifiers.set('%(cached_name)s', "
+            "%(expression)s)" % vars(),
+            input_pos=node.pos))
+        return [assign_code, if_code]
+
+    # output is captured the same way when generating an iterator, so the
+    # block is rendered to a string that can be cached.
+    def codegenASTCaptureStartNode(self, node):
+        function = self.function_stack[-1]
+        self.capture_stack.append((function.generating_iterator,
+                                   function.uses_buffer_write,
+                                   function.uses_buffer_extend))
+        code_nodes = []
+        if not function.generating_iterator:
+            code_nodes.append(CodeNode('%s = _buffer' % node.name,
+                                       input_pos=node.pos))
+        function.generating_iterator = False
+        code_nodes.append(CodeNode('_buffer = self.new_buffer()',
+                                   input_pos=node.pos))
+        code_nodes.extend(self.generate_buffer_aliases(node))
+        return code_nodes
+
+    def codegenASTCaptureEndNode(self, node):
+        function = self.function_stack[-1]
+        (function.generating_iterator, function.uses_buffer_write,
+         function.uses_buffer_extend) = self.capture_stack.pop()
+        code_nodes = [CodeNode('%s = _buffer.getvalue()' % node.target,
+                               input_pos=node.pos)]
+        if not function.generating_iterator:
+            code_nodes.append(CodeNode('_buffer = %s' % node.name,
+                                       input_pos=node.pos))
+            code_nodes.extend(self.generate_buffer_aliases(node))
+        return code_nodes
+
+    def generate_buffer_aliases(self, node):
+        return [CodeNode('_buffer_write = _buffer.write', input_pos=node.pos),
+                CodeNode('_buffer_extend = _buffer.extend', input_pos=node.pos)]
 
     def codegenASTFilterNode(self, node):
         expression = self.generate_python(self.build_code(node.expression)[0])
@@ -0,0 +1,379 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+import copy
+import string
+import sys
+import types
+import unittest
+
+from spitfire import runtime
+from spitfire.compiler import options
+from spitfire.compiler import util
+from spitfire.runtime import filters
+from spitfire.runtime import lazy
+from spitfire.runtime import template
+
+_TEMPLATE = """#def header($title)
+<h1>$title</h1>
+#end def
+#def maybe($flag)
+#if $flag
+yes
+#end if
+#end def
+#block body
+#for $i in $rows
+$i, #slurp
+#end for
+#end block
+$header('Title')
+$maybe(False)$maybe(True)
+#echo 'a' if $rows else 'b'
+$fail()
+"""
+
+
+class _Fail(Exception):
+    pass
+
+
+def _fail():
+    raise _Fail
+
+
+class LazyImportsTest(unittest.TestCase):
+
+    def setUp(self):
+        module = types.ModuleType('lazy_values_mod')
+        module.FLAG = False
+        module.TITLE = ''
+        module.ITEMS = [1, 2]
+        module.NAME = 'name'
+        sys.modules['lazy_values_mod'] = module
+
+    def tearDown(self):
+        del sys.modules['lazy_values_mod']
+
+    def _load_template(self, level, lazy_imports):
+        analyzer_options = copy.copy(options.optimizer_map[level])
+        analyzer_options.lazy_imports = lazy_imports
+        compiler_options = {
+            'new_registry_format': True,
+            'function_name_registry': {'upper': ('string.upper', [])},
+        }
+        return util.load_template(
+            '#from lazy_values_mod import FLAG\n'
+            '#from lazy_values_mod import TITLE\n'
+            '#from lazy_values_mod import ITEMS\n'
+            '#import lazy_values_mod\n'
+            '#if $FLAG\nflag\n#end if\n'
+            '[$TITLE]\n'
+            '#for $i in $ITEMS\n$i\n#end for\n'
+            '$lazy_values_mod.NAME $upper("x")\n',
+            'lazy_tmpl', analyzer_options=analyzer_options,
+            compiler_options=compiler_options)
+
+    def test_output_is_unchanged(self):
+        for level in sorted(options.optimizer_map):
+            expected = self._load_template(level, False)().main()
+            self.assertEqual(expected, '[]\n1\n2\nname X\n')
+            template_class = self._load_template(level, True)
+            module = sys.modules[template_class.__module__]
+            self.assertTrue(isinstance(module.lazy_values_mod,
+                                       lazy.LazyModule))
+            self.assertTrue(isinstance(module.upper, lazy.LazySymbol))
+            # values imported with #from are imported as usual.
+            self.assertEqual(module.FLAG, False)
+            self.assertEqual(template_class().main(), expected)
+            self.assertTrue(module.upper is string.upper)
+
+
+class GenerateIteratorsTest(unittest.TestCase):
+
+    def _get_template(self, level):
+        analyzer_options = copy.copy(options.optimizer_map[level])
+        analyzer_options.generate_iterators = True
+        template_class = util.load_template(_TEMPLATE, 'iter_tmpl',
+                                            analyzer_options=analyzer_options)
+        return template_class(search_list=[{'rows': [1, 2], 'fail': _fail}])
+
+    def test_same_output(self):
+        for level in sorted(options.optimizer_map):
+            template = self._get_template(level)
+            template.fail = lambda: ''
+            self.assertEqual(u''.join(template.main_iter()), template.main())
+            self.assertEqual(u''.join(template.header_iter('x')),
+                             template.header('x'))
+            self.assertEqual(list(template.maybe_iter(False)), [])
+
+    def test_streams_before_failure(self):
+        template = self._get_template(0)
+        chunks = template.main_iter()
+        self.assertEqual(chunks.next(), u'1, 2, ')
+        self.assertRaises(_Fail, list, chunks)
+
+
+class ShareBuffersTest(unittest.TestCase):
+
+    def _get_template(self, level, share_buffers=True):
+        analyzer_options = copy.copy(options.optimizer_map[level])
+        analyzer_options.share_buffers = share_buffers
+        template_class = util.load_template(_TEMPLATE, 'shared_tmpl',
+                                            analyzer_options=analyzer_options)
+        return template_class(search_list=[{'rows': [1, 2],
+                                            'fail': lambda: ''}])
+
+    def test_same_output(self):
+        for level in sorted(options.optimizer_map):
+            self.assertEqual(self._get_template(level).main(),
+                             self._get_template(level, False).main())
+
+    def test_write_to_caller_buffer(self):
+        tmpl = self._get_template(0)
+        buffer = template.BufferIO()
+        buffer.write(u'before ')
+        self.assertEqual(tmpl.header('x', _buffer=buffer), '')
+        self.assertEqual(buffer.getvalue(), u'before <h1>x</h1>\n')
+
+    def test_nested_calls_share_a_buffer(self):
+        tmpl = self._get_template(3)
+        buffers = []
+
+        def new_buffer():
+            buffers.append(template.BufferIO())
+            return buffers[-1]
+
+        tmpl.new_buffer = new_buffer
+        tmpl.main()
+        self.assertEqual(len(buffers), 1)
+
+
+class BytesOutputTest(unittest.TestCase):
+
+    def _get_template(self, level, src_text):
+        analyzer_options = copy.copy(options.optimizer_map[level])
+        analyzer_options.bytes_output = True
+        template_class = util.load_template(src_text, 'bytes_tmpl',
+                                            analyzer_options=analyzer_options)
+        return template_class(search_list=[{'name': u'\xfc', 'count': 3}])
+
+    def test_output_is_utf8(self):
+        for level in sorted(options.optimizer_map):
+            tmpl = self._get_template(level, u'caf\xe9 $name $count\n')
+            output = tmpl.main()
+            self.assertEqual(type(output), str)
+            self.assertEqual(output, 'caf\xc3\xa9 \xc3\xbc 3\n')
+
+    def test_echo(self):
+        for level in sorted(options.optimizer_map):
+            tmpl = self._get_template(
+                level, u'caf\xe9\n#echo "a" if $count else "b"#\n'
+                u'#echo "c"\n')
+            output = tmpl.main()
+            self.assertEqual(type(output), str)
+            self.assertEqual(output, 'caf\xc3\xa9\na\nc')
+
+    def test_filter_directive_is_kept(self):
+        tmpl = self._get_template(
+            0, u'#from spitfire.runtime.filters import escape_html\n'
+            u'#filter escape_html\n$count\n')
+        self.assertEqual(tmpl._filter_function, filters.escape_html)
+
+
+class FoldConstantPlaceholdersTest(unittest.TestCase):
+
+    def _load_template(self, src_text, template_name):
+        # #extends needs the base template on disk above -O1.
+        analyzer_options = copy.copy(options.optimizer_map[1])
+        analyzer_options.fold_constant_placeholders = True
+        compiler_options = {
+            'new_registry_format': True,
+            'function_name_registry': {
+                'lower': ('string.lower', ['cache_forever']),
+                'pure_lower': ('string.lower', ['pure']),
+                'float': ('__builtin__.float', ['pure']),
+            },
+        }
+        return util.load_template(src_text, template_name,
+                                  analyzer_options=analyzer_options,
+                                  compiler_options=compiler_options)
+
+    def test_base_template_filter(self):
+        self._load_template(
+            '#from spitfire.runtime.filters import escape_html\n'
+            '#filter escape_html\n', 'fold_base_tmpl')
+        template_class = self._load_template(
+            '#extends fold_base_tmpl\n#def body\n$lower("<B>")\n#end def\n',
+            'fold_child_tmpl')
+        self.assertEqual(template_class().body(), '&lt;b&gt;\n')
+
+    def test_pure_base_template_filter(self):
+        self._load_template(
+            '#from spitfire.runtime.filters import escape_html\n'
+            '#filter escape_html\n', 'pure_base_tmpl')
+        template_class = self._load_template(
+            '#extends pure_base_tmpl\n#def body\n$pure_lower("<B>")\n'
+            '#end def\n', 'pure_child_tmpl')
+        self.assertEqual(template_class().body(), '&lt;b&gt;\n')
+
+    def test_pure_non_finite_float(self):
+        template_class = self._load_template(
+            '#set $x = $float("inf")\n$x\n', 'pure_float_tmpl')
+        self.assertEqual(template_class().main(), 'inf\n')
+
+    def test_default_filter(self):
+        template_class = self._load_template('$lower("<B>")\n', 'fold_tmpl')
+        tmpl = template_class(default_filter=filters.escape_html)
+        self.assertEqual(tmpl.main(), '&lt;b&gt;\n')
+
+
+class MemoizePerRenderTest(unittest.TestCase):
+
+    def _get_template(self, level, decorators):
+        compiler_options = {
+            'new_registry_format': True,
+            'function_name_registry': {'upper': ('string.upper', decorators)},
+        }
+        template_class = util.load_template(
+            '#for $w in $words\n$upper($w)\n#end for\n', 'memoize_tmpl',
+            analyzer_options=options.optimizer_map[level],
+            compiler_options=compiler_options)
+        return template_class(search_list=[{'words': ['a', 'a', 'b']}])
+
+    def test_memoize(self):
+        for level in sorted(options.optimizer_map):
+            tmpl = self._get_template(level, ['memoize_per_render'])
+            self.assertEqual(tmpl.main(), 'A\nA\nB\n')
+            self.assertEqual(len(tmpl.memoize_cache), 2)
+
+    def test_not_memoized(self):
+        tmpl = self._get_template(3, [])
+        self.assertEqual(tmpl.main(), 'A\nA\nB\n')
+        self.assertEqual(tmpl.memoize_cache, None)
+
+
+class _DictFragmentCache(dict):
+
+    def set(self, key, value, ttl=None):
+        self[key] = value
+
+
+class CacheBlockTest(unittest.TestCase):
+
+    def test_cache_block(self):
+        src_text = ('#for $i in [1, 2, 1]\n'
+                    '#cache key=$i ttl=60\n'
+                    '$i: $count()\n'
+                    '#end cache\n'
+                    '#end for\n')
+        for level in sorted(options.optimizer_map):
+            for iterators in (False, True):
+                analyzer_options = copy.copy(options.optimizer_map[level])
+                analyzer_options.generate_iterators = iterators
+                template_class = util.load_template(
+                    src_text, 'cache_tmpl', analyzer_options=analyzer_options)
+                counter = iter(xrange(10))
+                fragment_cache = _DictFragmentCache()
+                tmpl = template_class(
+                    search_list=[{'count': counter.next}],
+                    fragment_cache=fragment_cache)
+                if iterators:
+                    output = ''.join(tmpl.main_iter())
+                else:
+                    output = tmpl.main()
+                self.assertEqual(output, '1: 0\n2: 1\n1: 0\n')
+                self.assertEqual(sorted(fragment_cache.values()),
+                                 ['1: 0\n', '2: 1\n'])
+
+
+class CachedIdentifiersTest(unittest.TestCase):
+
+    def test_cached_identifiers(self):
+        for level in sorted(options.optimizer_map):
+            template_class = util.load_template(
+                "${count('a')|cache} ${count('b')|cache}\n", 'cached_tmpl',
+                analyzer_options=options.optimizer_map[level])
+            store = sys.modules[template_class.__module__]._cached_identifiers
+            counter = iter(xrange(10))
+            tmpl = template_class(
+                search_list=[{'count': lambda name: counter.next()}])
+            self.assertEqual(tmpl.main(), '0 1\n')
+            self.assertEqual(tmpl.main(), '0 1\n')
+            self.assertEqual(len(store), 2)
+            store.clear()
+            self.assertEqual(tmpl.main(), '2 3\n')
+
+    def test_max_size(self):
+        for level in sorted(options.optimizer_map):
+            template_class = util.load_template(
+                "#for $i in [1, 2]\n${count('a')|cache} ${count('b')|cache}\n"
+                "#end for\n", 'cached_max_tmpl',
+                analyzer_options=options.optimizer_map[level])
+            store = sys.modules[template_class.__module__]._cached_identifiers
+            store.max_size = 1
+            counter = iter(xrange(10))
+            tmpl = template_class(
+                search_list=[{'count': lambda name: counter.next()}])
+            # each name evicts the other, so both are computed every time.
+            self.assertEqual(tmpl.main(), '0 1\n2 3\n')
+            self.assertEqual(len(store), 1)
+
+
+class _Row(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+class UdnInlineCachesTest(unittest.TestCase):
+
+    def test_udn_inline_caches(self):
+        rows = [{'name': 'a'}, _Row('b'), {'name': 'c'}]
+        for level in sorted(options.optimizer_map):
+            analyzer_options = copy.copy(options.optimizer_map[level])
+            analyzer_options.udn_inline_caches = True
+            template_class = util.load_template(
+                '#for $row in $rows\n$row.name\n#end for\n', 'udn_ic_tmpl',
+                analyzer_options=analyzer_options)
+            module = sys.modules[template_class.__module__]
+            self.assertTrue(hasattr(module, '_udn_ic_0'))
+            tmpl = template_class(search_list=[{'rows': rows}])
+            self.assertEqual(tmpl.main(), 'a\nb\nc\n')
+
+
+class SpecializeDictLoopsTest(unittest.TestCase):
+
+    def test_mixed_rows(self):
+        for level in (2, 3):
+            analyzer_options = copy.copy(options.optimizer_map[level])
+            analyzer_options.specialize_dict_loops = True
+            template_class = util.load_template(
+                '#for $row in $rows\n$row.name\n#end for\n', 'dict_loop_tmpl',
+                analyzer_options=analyzer_options)
+            tmpl = template_class(search_list=[{'rows': [{'name': 'a'}, _Row(
+                'b'), {'name': 'c'}]}])
+            self.assertEqual(tmpl.main(), 'a\nb\nc\n')
+            # missing keys still go through resolve_udn.
+            tmpl = template_class(search_list=[{'rows': [{}]}])
+            self.assertRaises(runtime.PlaceholderError, tmpl.main)
+
+    def test_nested_loops(self):
+        rows = [{'name': 'a', 'cols': [{'name': 'x'}, _Row('y')]},
+                _Row('b')]
+        rows[1].cols = [{'name': 'z'}]
+        for level in (2, 3):
+            analyzer_options = copy.copy(options.optimizer_map[level])
+            analyzer_options.specialize_dict_loops = True
+            template_class = util.load_template(
+                '#for $row in $rows\n$row.name:\n#for $c in $row.cols\n'
+                '$c.name\n#end for\n#end for\n', 'dict_nested_loop_tmpl',
+                analyzer_options=analyzer_options)
+            tmpl = template_class(search_list=[{'rows': rows}])
+            self.assertEqual(tmpl.main(), 'a:\nx\ny\nb:\nz\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
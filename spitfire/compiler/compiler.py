@@ -9,6 +9,7 @@ import os.path
 import sys
 
 from spitfire.compiler import analyzer
+from spitfire.compiler import cache
 from spitfire.compiler import codegen
 from spitfire.compiler import optimizer
 from spitfire.compiler import options
@@ -28,6 +29,7 @@ class Compiler(object):
         'baked_mode',
         'base_extends_package',
         'base_template_full_import_path',
+        'compile_cache_directory',
         'debug_flags',
         'compiler_stack_traces',
         'default_to_strict_resolution',
@@ -46,6 +48,7 @@ class Compiler(object):
         'optimizer_flags',
         'optimizer_level',
         'output_directory',
+        'output_format',
         'skip_import_udn_resolution',
         'static_analysis',
         'strict_global_check',
@@ -68,8 +71,11 @@ class Compiler(object):
         # record transient state of the compiler
         self.src_filename = None
         self.src_text = None
-        self.src_line_map = []
+        # util.LineIndex for src_text, see generate_line_map
+        self.src_line_index = None
         self.output_directory = ''
+        # write 'py' source files, 'pyc' bytecode files or 'both'
+        self.output_format = 'py'
         self.xspt_mode = False
         self.write_file = False
         self.analyzer_options = None
@@ -107,6 +113,12 @@ class Compiler(object):
         self.include_path = '.'
         self.enable_filters = True
         self.tune_gc = False
+        # directory of the on-disk cache of generated code, keyed by a hash of
+        # everything that goes into compiling a template.
+        self.compile_cache_directory = None
+        # the functions defined by base templates, shared by every template
+        # this compiler compiles.
+        self.template_function_cache = optimizer.TemplateFunctionCache()
 
         # the function registry is for optimized access to 'first-class'
         # functions things that get accessed all the time that should be speedy
@@ -215,9 +227,9 @@ class Compiler(object):
     def calculate_line_and_column(self, pos):
         if not self.src_text:
             return (0, 0)
-        lineno = 1 + self.src_text.count('\n', 0, pos)
-        colno = pos - (self.src_text.rfind('\n', 0, pos) + 2)
-        return (lineno, colno)
+        if self.src_line_index is None:
+            self.generate_line_map()
+        return self.src_line_index.get_line_and_column(pos)
 
     def print_stderr_message(self,
                              message,
@@ -262,6 +274,10 @@ class Compiler(object):
         try:
             self._reset()
             self._parse_tree = util.parse_template(src_text, self.xspt_mode)
+            # when called from compile_file, let templates that extend this one
+            # reuse the source instead of reading the file again.
+            if self.src_filename and src_text is self.src_text:
+                self.template_function_cache.seed(self.src_filename, src_text)
             return self._compile_ast(self._parse_tree, classname)
         finally:
             if self.tune_gc:
@@ -274,32 +290,62 @@ class Compiler(object):
         self.classname = util.filename2classname(filename)
         self.src_text = util.read_template_file(filename)
         self.generate_line_map()
-        src_code = self.compile_template(self.src_text, self.classname)
+        src_code = self._compile_template_cached(self.src_text, self.classname)
         if self.write_file:
-            self.write_src_file(src_code)
+            if self.output_format != 'pyc':
+                self.write_src_file(src_code)
+            if self.output_format != 'py':
+                self.write_bytecode_file(src_code)
+        return src_code
+
+    def _compile_template_cached(self, src_text, classname):
+        # extracting the message catalogue and reporting warnings are side
+        # effects of compiling, so they always have to run the full pipeline.
+        if (not self.compile_cache_directory or
+                self.extract_message_catalogue or self.enable_warnings):
+            return self.compile_template(src_text, classname)
+
+        compile_cache = cache.CompileCache(self.compile_cache_directory)
+        cache_key = cache.get_cache_key(self, src_text, classname)
+        if cache_key is None:
+            return self.compile_template(src_text, classname)
+        src_code = compile_cache.get(cache_key)
+        if src_code is not None:
+            self._reset()
+            self._source_code = src_code
+            return src_code
+        src_code = self.compile_template(src_text, classname)
+        compile_cache.put(cache_key, src_code)
         return src_code
 
     def generate_line_map(self):
-        self.src_line_map = []
-        current_line = 1
-        for c in self.src_text:
-            self.src_line_map.append(current_line)
-            if c == '\n':
-                current_line += 1
+        self.src_line_index = util.LineIndex(self.src_text)
 
-    def write_src_file(self, src_code):
-        outfile_name = '%s.py' % self.classname
-        relative_dir = os.path.dirname(self.src_filename)
+    def _get_src_path(self, filename):
+        outfile_name = '%s.py' % util.filename2classname(filename)
+        relative_dir = os.path.dirname(filename)
         if self.output_directory and os.path.isabs(relative_dir):
             self.error(CompilerError(
                 "can't mix output_directory and absolute paths"))
 
-        outfile_path = os.path.join(self.output_directory, relative_dir,
-                                    outfile_name)
+        return os.path.join(self.output_directory, relative_dir, outfile_name)
+
+    def get_output_path(self, filename):
+        """Return the path compile_file writes for the template filename."""
+        if self.output_format == 'pyc':
+            return self._get_src_path(filename) + 'c'
+        return self._get_src_path(filename)
+
+    def write_src_file(self, src_code):
+        outfile_path = self._get_src_path(self.src_filename)
         outfile = open(outfile_path, 'w')
         outfile.write(src_code)
         outfile.close()
 
+    def write_bytecode_file(self, src_code):
+        util.write_bytecode_file(src_code,
+                                 self._get_src_path(self.src_filename))
+
     def registry_contains(self, fname):
         """Returns True if the registry contains a function."""
         return fname in self.function_name_registry
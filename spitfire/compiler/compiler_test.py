@@ -0,0 +1,33 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+import unittest
+
+from spitfire.compiler import compiler
+
+
+class LineMapTest(unittest.TestCase):
+
+    def _get_compiler(self, src_text):
+        spt_compiler = compiler.Compiler()
+        spt_compiler.src_text = src_text
+        return spt_compiler
+
+    def test_calculate_line_and_column(self):
+        src_text = 'one\ntwo\n\nfour'
+        spt_compiler = self._get_compiler(src_text)
+        for pos in xrange(len(src_text) + 1):
+            self.assertEqual(
+                spt_compiler.calculate_line_and_column(pos),
+                (1 + src_text.count('\n', 0, pos),
+                 pos - (src_text.rfind('\n', 0, pos) + 2)))
+
+    def test_no_source(self):
+        self.assertEqual(
+            compiler.Compiler().calculate_line_and_column(10), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+"""Track template dependencies between builds for incremental compilation.
+
+A template's generated code depends on its own source, on how the compiler is
+configured and, with use_dependency_analysis, on the functions defined by
+every template in its extends chain. The manifest records a fingerprint of
+the compiler and, for each template that was built, a hash of its source and
+of each of its ancestors. A later build only needs to recompile the templates
+for which one of those hashes changed.
+"""
+
+import hashlib
+import json
+import os
+import os.path
+import re
+import tempfile
+
+from spitfire.compiler import cache
+from spitfire.compiler import optimizer
+
+# this is looser than optimizer.extends_re so that indented directives and
+# #absolute_extends are tracked too - a false positive only costs a rebuild.
+_extends_re = re.compile(r'^\s*#(?:absolute_)?extends\s+([\.\w]+)')
+
+
+class BuildManifest(object):
+    """The dependency graph recorded by the last build.
+
+    Args:
+        path: The file the manifest is loaded from and saved to.
+        spt_compiler: The compiler.Compiler used for the build. If it is
+            configured differently from the one that wrote the manifest, every
+            template is considered stale.
+    """
+
+    def __init__(self, path, spt_compiler):
+        self.path = path
+        self.compiler = spt_compiler
+        self.fingerprint = hashlib.sha1('%s:%s' % (
+            cache.get_compiler_fingerprint(spt_compiler),
+            os.path.abspath(spt_compiler.include_path))).hexdigest()
+        # filename -> {'hash': source hash, 'ancestors': {path: hash},
+        #              'output': generated file}
+        self.templates = {}
+        self._file_hashes = {}
+        self._direct_ancestors = {}
+        self.load()
+
+    def load(self):
+        try:
+            f = open(self.path)
+        except IOError:
+            return
+        try:
+            data = json.load(f)
+        except ValueError:
+            # a corrupt manifest just means everything gets rebuilt.
+            return
+        finally:
+            f.close()
+        if data.get('fingerprint') == self.fingerprint:
+            self.templates = data.get('templates', {})
+
+    def save(self):
+        data = {'fingerprint': self.fingerprint, 'templates': self.templates}
+        dirname = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix='.tmp')
+        try:
+            f = os.fdopen(fd, 'w')
+            try:
+                json.dump(data, f, indent=1, sort_keys=True)
+            finally:
+                f.close()
+            os.rename(tmp_path, self.path)
+        except:
+            os.unlink(tmp_path)
+            raise
+
+    def get_file_hash(self, path):
+        """Return the hash of a file's contents, or None if it's missing."""
+        try:
+            return self._file_hashes[path]
+        except KeyError:
+            pass
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            digest = None
+        else:
+            try:
+                digest = hashlib.sha1(f.read()).hexdigest()
+            finally:
+                f.close()
+        self._file_hashes[path] = digest
+        return digest
+
+    def _get_direct_ancestors(self, path):
+        try:
+            return self._direct_ancestors[path]
+        except KeyError:
+            pass
+        ancestors = []
+        try:
+            f = open(path)
+        except IOError:
+            f = None
+        if f is not None:
+            for line in f:
+                match = _extends_re.match(line)
+                if not match:
+                    continue
+                base_path = os.path.join(self.compiler.include_path,
+                                         match.group(1).replace('.', '/'))
+                for ext in optimizer.template_extensions:
+                    if os.path.exists(base_path + ext):
+                        ancestors.append(base_path + ext)
+                        break
+            f.close()
+        self._direct_ancestors[path] = ancestors
+        return ancestors
+
+    def get_ancestors(self, filename):
+        """Return the template files filename extends, directly or not."""
+        ancestors = set()
+        pending = [filename]
+        while pending:
+            for path in self._get_direct_ancestors(pending.pop()):
+                if path not in ancestors:
+                    ancestors.add(path)
+                    pending.append(path)
+        ancestors.discard(filename)
+        return ancestors
+
+    def is_stale(self, filename):
+        """Return True if filename needs to be recompiled."""
+        entry = self.templates.get(filename)
+        if entry is None:
+            return True
+        if entry['hash'] != self.get_file_hash(filename):
+            return True
+        if entry['output'] and not os.path.exists(entry['output']):
+            return True
+        for path, digest in entry['ancestors'].iteritems():
+            if self.get_file_hash(path) != digest:
+                return True
+        return False
+
+    def get_stale_files(self, filenames):
+        return [filename for filename in filenames if self.is_stale(filename)]
+
+    def record(self, filename, output_path=None):
+        """Record that filename was compiled against the current sources."""
+        self.templates[filename] = {
+            'hash': self.get_file_hash(filename),
+            'ancestors': dict((path, self.get_file_hash(path))
+                              for path in self.get_ancestors(filename)),
+            'output': output_path,
+        }
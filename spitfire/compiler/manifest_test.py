@@ -0,0 +1,89 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from spitfire.compiler import compiler
+from spitfire.compiler import manifest
+from spitfire.compiler import options
+
+
+class BuildManifestTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.manifest_path = os.path.join(self.temp_dir, 'manifest.json')
+        self.base = self._write_template('base', '#def header\n#end def\n')
+        self.middle = self._write_template('middle', '#extends base\n')
+        self.page = self._write_template('page', '#extends middle\n$header\n')
+        self.other = self._write_template('other', 'other\n')
+        self.templates = [self.base, self.middle, self.page, self.other]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write_template(self, name, src_text):
+        path = os.path.join(self.temp_dir, name + '.spt')
+        f = open(path, 'w')
+        f.write(src_text)
+        f.close()
+        return path
+
+    def _get_manifest(self, analyzer_options=options.default_options):
+        spt_compiler = compiler.Compiler(analyzer_options=analyzer_options,
+                                         include_path=self.temp_dir)
+        return manifest.BuildManifest(self.manifest_path, spt_compiler)
+
+    def _build(self):
+        build_manifest = self._get_manifest()
+        for filename in build_manifest.get_stale_files(self.templates):
+            build_manifest.record(filename)
+        build_manifest.save()
+
+    def test_everything_is_stale_without_a_manifest(self):
+        self.assertEqual(self._get_manifest().get_stale_files(self.templates),
+                         self.templates)
+
+    def test_nothing_is_stale_after_a_build(self):
+        self._build()
+        self.assertEqual(self._get_manifest().get_stale_files(self.templates),
+                         [])
+
+    def test_ancestors(self):
+        self.assertEqual(self._get_manifest().get_ancestors(self.page),
+                         set([self.base, self.middle]))
+
+    def test_base_change_invalidates_descendants(self):
+        self._build()
+        self._write_template('base', '#def footer\n#end def\n')
+        self.assertEqual(self._get_manifest().get_stale_files(self.templates),
+                         [self.base, self.middle, self.page])
+
+    def test_leaf_change_only_invalidates_leaf(self):
+        self._build()
+        self._write_template('page', '#extends middle\nchanged\n')
+        self.assertEqual(self._get_manifest().get_stale_files(self.templates),
+                         [self.page])
+
+    def test_option_change_invalidates_everything(self):
+        self._build()
+        self.assertEqual(
+            self._get_manifest(options.o3_options).get_stale_files(
+                self.templates), self.templates)
+
+    def test_missing_output_is_stale(self):
+        build_manifest = self._get_manifest()
+        build_manifest.record(self.other,
+                              os.path.join(self.temp_dir, 'other.py'))
+        build_manifest.save()
+        self.assertEqual(self._get_manifest().get_stale_files([self.other]),
+                         [self.other])
+
+
+if __name__ == '__main__':
+    unittest.main()
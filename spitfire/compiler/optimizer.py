@@ -404,7 +404,8 @@ class OptimizationAnalyzer(_BaseAnalyzer):
                 path = os.path.join(
                     *[ident_node.name
                       for ident_node in n.source_module_name_list])
-                template_function_names = get_template_functions(
+                function_cache = self.compiler.template_function_cache
+                template_function_names = function_cache.get_template_functions(
                     self.compiler.include_path, path)
                 template.template_methods.update(template_function_names)
 
@@ -986,6 +987,8 @@ class FinalPassAnalyzer(_BaseAnalyzer):
         self.reanalyzeLoopNode(for_node)
         if self.options.batch_buffer_writes:
             self.collect_writes(for_node)
+        if self.options.specialize_dict_loops:
+            self.specialize_dict_loop(for_node)
 
     def analyzeIfNode(self, if_node):
         # depth-first
@@ -1014,6 +1017,75 @@ class FinalPassAnalyzer(_BaseAnalyzer):
             buffer_write.expression.sanitization_state = (
                 ast.SanitizedState.OUTPUTTED_IMMEDIATELY)
 
+    def specialize_dict_loop(self, for_node):
+        """Split the body of a loop into a version for rows that are dicts
+        and the original version for everything else.
+
+        In the dict version, $row.name is looked up as a key. resolve_udn
+        prefers attributes, but a dict only has the attributes of its type, so
+        names that aren't attributes of dict find the same value either way.
+        """
+        if len(for_node.target_list.child_nodes) != 1:
+            return
+        target = for_node.target_list.child_nodes[0]
+        if not isinstance(target, ast.IdentifierNode):
+            return
+        # the guard needs the builtin type and dict. it mentions them itself,
+        # so only look for things that bind the names.
+        guard_names = ('type', 'dict')
+        for n in self.ast_root.import_nodes:
+            if n.module_name_list[0].name in guard_names:
+                return
+        for n in self.ast_root.from_nodes:
+            if (n.alias or n.identifier).name in guard_names:
+                return
+        function = _get_parent_node_by_type(for_node, ast.FunctionNode)
+        for n in walker.flatten_tree(function):
+            if isinstance(n, ast.ParameterNode):
+                bound_names = [n.name]
+            elif isinstance(n, ast.AssignNode):
+                bound_names = [getattr(n.left, 'name', None)]
+            elif isinstance(n, ast.ForNode):
+                bound_names = [t.name
+                               for t in walker.flatten_tree(n.target_list)
+                               if isinstance(t, ast.IdentifierNode)]
+            else:
+                continue
+            if set(bound_names) & set(guard_names):
+                return
+
+        # the children point back at the loop, which shouldn't be copied.
+        dict_body = copy.deepcopy(for_node.child_nodes,
+                                  {id(for_node): for_node})
+        udn_nodes = []
+        for child_node in dict_body:
+            for n in walker.flatten_tree(child_node):
+                if isinstance(n, ast.AssignNode) and n.left == target:
+                    # the row is replaced partway through the body.
+                    return
+                if isinstance(n, ast.ForNode) and target in (
+                        n.target_list.child_nodes):
+                    return
+                if (type(n) is ast.GetUDNNode and n.expression == target and
+                        not hasattr(dict, n.name)):
+                    udn_nodes.append(n)
+        if not udn_nodes:
+            return
+        for n in udn_nodes:
+            n.dict_lookup = True
+
+        get_type = ast.CallFunctionNode(
+            ast.IdentifierNode('type'), ast.ArgListNode(), pos=for_node.pos)
+        get_type.arg_list.append(ast.IdentifierNode(target.name))
+        get_type.sanitization_state = ast.SanitizedState.NOT_OUTPUTTED
+        if_node = ast.IfNode(
+            ast.BinOpExpressionNode('is', get_type, ast.IdentifierNode('dict')),
+            pos=for_node.pos)
+        if_node.extend(dict_body)
+        if_node.else_.extend(for_node.child_nodes)
+        for_node.child_nodes = ast.NodeList()
+        for_node.append(if_node)
+
     def hoist(self, parent_node, parent_block, insertion_point, alias_node,
               assign_alias_node):
 
@@ -1147,3 +1219,72 @@ def get_template_functions(base_dir, path):
                                                                   extend_path))
     f.close()
     return template_function_names
+
+
+class TemplateFunctionCache(object):
+    """Remembers the template functions defined along extends chains.
+
+    get_template_functions opens and scans every file up the extends chain each
+    time it is called. When many templates share the same base templates, one
+    cache can be kept for a whole compiler session instead. Entries are keyed
+    by path and revalidated against the file's mtime, so a base template that
+    changes mid-session is scanned again.
+    """
+
+    def __init__(self):
+        # path -> (mtime, template function names, extends paths)
+        self._entries = {}
+
+    def _get_entry(self, path):
+        mtime = os.path.getmtime(path)
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != mtime:
+            f = open(path)
+            entry = (mtime,) + self._scan(f)
+            f.close()
+            self._entries[path] = entry
+        return entry
+
+    def _scan(self, lines):
+        function_names = set()
+        extends_paths = []
+        for line in lines:
+            match = template_function_re.match(line)
+            if match:
+                function_names.add(match.group(2))
+                continue
+            match = extends_re.match(line)
+            if match:
+                extends_paths.append(match.group(1).replace('.', '/'))
+        return frozenset(function_names), tuple(extends_paths)
+
+    def seed(self, path, src_text):
+        """Record the template functions of a template that's already been
+        read, so it doesn't have to be read again.
+
+        The source is scanned the same way as a file would be, so the result
+        doesn't depend on whether the template was compiled first.
+
+        Args:
+            path: The file the template was read from.
+            src_text: The contents of the file.
+        """
+        self._entries[os.path.abspath(path)] = (
+            (os.path.getmtime(path),) + self._scan(src_text.splitlines(True)))
+
+    def get_template_functions(self, base_dir, path):
+        """A cached version of the module level get_template_functions."""
+        template_function_names = set()
+        pending = [path]
+        seen = set()
+        while pending:
+            real_path = os.path.abspath(_extend_to_real_path(base_dir,
+                                                             pending.pop()))
+            if real_path in seen:
+                continue
+            seen.add(real_path)
+            unused_mtime, function_names, extends_paths = self._get_entry(
+                real_path)
+            template_function_names.update(function_names)
+            pending.extend(extends_paths)
+        return template_function_names
@@ -3,6 +3,10 @@
 # Use of this source code is governed by a BSD-style
 # license that can be found in the LICENSE file.
 
+import copy
+import os
+import shutil
+import tempfile
 import unittest
 
 from spitfire.compiler import analyzer
@@ -66,6 +70,21 @@ class BaseTest(unittest.TestCase):
         template_node.source_path = 'test_template.spt'
         return template_node
 
+    def _get_final_tree(self, code):
+        ast_root = self._compile(code)
+        semantic_analyzer = analyzer.SemanticAnalyzer(
+            'TestTemplate', ast_root, self.compiler.analyzer_options,
+            self.compiler)
+        analyzed_tree = semantic_analyzer.get_ast()
+
+        optimization_analyzer = self._get_analyzer(analyzed_tree)
+        optimized_tree = optimization_analyzer.optimize_ast()
+
+        final_pass_analyzer = optimizer.FinalPassAnalyzer(
+            optimized_tree, self.compiler.analyzer_options, self.compiler)
+
+        return final_pass_analyzer.optimize_ast()
+
 
 class TestAnalyzeListLiteralNode(BaseTest):
 
@@ -1015,21 +1034,6 @@ class TestHoistOnlyClean(BaseTest):
         self.compiler.function_name_registry['reg_f'] = ('a.reg_f',
                                                          ['skip_filter'])
 
-    def _get_final_tree(self, code):
-        ast_root = self._compile(code)
-        semantic_analyzer = analyzer.SemanticAnalyzer(
-            'TestTemplate', ast_root, self.compiler.analyzer_options,
-            self.compiler)
-        analyzed_tree = semantic_analyzer.get_ast()
-
-        optimization_analyzer = self._get_analyzer(analyzed_tree)
-        optimized_tree = optimization_analyzer.optimize_ast()
-
-        final_pass_analyzer = optimizer.FinalPassAnalyzer(
-            optimized_tree, self.compiler.analyzer_options, self.compiler)
-
-        return final_pass_analyzer.optimize_ast()
-
     def test_should_hoist_for(self):
         code = """
         #def foo($bar)
@@ -1247,5 +1251,175 @@ class TestSanitizationOptimizations(BaseTest):
                 'Expected node in ast.FilterNode to not need sanitization.')
 
 
+class TestSpecializeDictLoops(BaseTest):
+
+    def setUp(self):
+        analyzer_options = copy.copy(options.o3_options)
+        analyzer_options.specialize_dict_loops = True
+        self.compiler = compiler.Compiler(analyzer_options=analyzer_options,
+                                          xspt_mode=False,
+                                          compiler_stack_traces=True)
+
+    def _get_dict_lookups(self, code):
+        final_tree = self._get_final_tree(code)
+        return [n.name
+                for n in walker.flatten_tree(final_tree)
+                if isinstance(n, ast.GetUDNNode) and n.dict_lookup]
+
+    def test_specialize(self):
+        code = """
+        #def foo($rows)
+          #for $row in $rows
+            $row.name $row.keys
+          #end for
+        #end def
+        """
+        self.assertEqual(self._get_dict_lookups(code), ['name'])
+
+    def test_target_reassigned(self):
+        code = """
+        #def foo($rows)
+          #for $row in $rows
+            $row.name
+            #set $row = None
+          #end for
+        #end def
+        """
+        self.assertEqual(self._get_dict_lookups(code), [])
+
+    def test_builtin_shadowed(self):
+        code = """
+        #def foo($rows, $type)
+          #for $row in $rows
+            $row.name
+          #end for
+        #end def
+        """
+        self.assertEqual(self._get_dict_lookups(code), [])
+
+    def test_builtin_assigned(self):
+        code = """
+        #def foo($rows)
+          #set $dict = None
+          #for $row in $rows
+            $row.name
+          #end for
+        #end def
+        """
+        self.assertEqual(self._get_dict_lookups(code), [])
+
+    def test_builtin_imported(self):
+        code = """
+        #from mymodule import type
+        #def foo($rows)
+          #for $row in $rows
+            $row.name
+          #end for
+        #end def
+        """
+        self.assertEqual(self._get_dict_lookups(code), [])
+
+    def test_nested_loops(self):
+        code = """
+        #def foo($rows)
+          #for $row in $rows
+            $row.a
+            #for $c in $row.cols
+              $c.name
+            #end for
+            $row.b
+          #end for
+        #end def
+        """
+        # the inner loop is specialized in both versions of the outer body.
+        self.assertEqual(sorted(self._get_dict_lookups(code)),
+                         ['a', 'b', 'cols', 'name', 'name'])
+
+    def test_sibling_loops(self):
+        code = """
+        #def foo($rows)
+          #for $row in $rows
+            $row.a
+          #end for
+          #for $row in $rows
+            $row.b
+          #end for
+        #end def
+        """
+        self.assertEqual(sorted(self._get_dict_lookups(code)), ['a', 'b'])
+
+
+class TestTemplateFunctionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self._write_template('base', '#def header\n#end def\n')
+        self._write_template('middle', '#extends base\n#block body\n'
+                             '#end block\n')
+        self.cache = optimizer.TemplateFunctionCache()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write_template(self, name, src_text, mtime=None):
+        path = os.path.join(self.temp_dir, name + '.spt')
+        f = open(path, 'w')
+        f.write(src_text)
+        f.close()
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_matches_uncached(self):
+        self.assertEqual(
+            self.cache.get_template_functions(self.temp_dir, 'middle'),
+            optimizer.get_template_functions(self.temp_dir, 'middle'))
+        self.assertEqual(
+            self.cache.get_template_functions(self.temp_dir, 'middle'),
+            set(['header', 'body']))
+
+    def test_files_are_scanned_once(self):
+        self.cache._get_entry = test_util.RecordedFunction(
+            self.cache._get_entry)
+        self.cache.get_template_functions(self.temp_dir, 'middle')
+        self.cache.get_template_functions(self.temp_dir, 'middle')
+        self.cache.get_template_functions(self.temp_dir, 'base')
+        self.assertEqual(len(self.cache._get_entry.GetCalls()), 5)
+        self.assertEqual(len(self.cache._entries), 2)
+
+    def test_modified_file_is_rescanned(self):
+        self._write_template('base', '#def header\n#end def\n', mtime=1000)
+        self.cache.get_template_functions(self.temp_dir, 'base')
+        self._write_template('base', '#def footer\n#end def\n', mtime=2000)
+        self.assertEqual(
+            self.cache.get_template_functions(self.temp_dir, 'base'),
+            set(['footer']))
+
+    def test_seed(self):
+        path = self._write_template('page', '#extends middle\n')
+        self.cache.seed(path, '#extends middle\n#def title\n#end def\n')
+        self.assertEqual(
+            self.cache.get_template_functions(self.temp_dir, 'page'),
+            set(['header', 'body', 'title']))
+
+    def test_seed_matches_scan(self):
+        # the scan doesn't know about comments, and seeding has to agree
+        # with it whatever order templates are compiled in.
+        src_text = '#extends middle\n#*\n#def hidden\n#end def\n*#\n'
+        path = self._write_template('page', src_text)
+        expected = self.cache.get_template_functions(self.temp_dir, 'page')
+        self.assertIn('hidden', expected)
+        cache = optimizer.TemplateFunctionCache()
+        cache.seed(path, src_text)
+        self.assertEqual(cache.get_template_functions(self.temp_dir, 'page'),
+                         expected)
+
+    def test_extends_cycle(self):
+        self._write_template('base', '#extends middle\n')
+        self.assertEqual(
+            self.cache.get_template_functions(self.temp_dir, 'middle'),
+            set(['body']))
+
+
 if __name__ == '__main__':
     unittest.main()
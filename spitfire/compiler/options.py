@@ -117,6 +117,51 @@ class AnalyzerOptions(object):
         # Generate line number comments in compiler output.
         self.include_sourcemap = False
 
+        # Bind #import names and function registry imports to proxies that
+        # import their target on first use instead of when the template
+        # module is loaded. Other #from imports and the modules base templates
+        # live in are still imported eagerly.
+        self.lazy_imports = False
+
+        # Also generate a <name>_iter generator for main and every #def and
+        # #block, which yields the output in chunks as it's produced. Calls to
+        # other template methods go through their _iter versions too, so every
+        # template in a hierarchy should be compiled with this on.
+        self.generate_iterators = False
+
+        # Give template methods a _buffer=None argument. When a caller passes
+        # its buffer, the method writes into it and returns '' instead of
+        # building and returning a string of its own. Direct calls to other
+        # template methods pass the caller's buffer down, so every template in
+        # a hierarchy should be compiled with this on.
+        self.share_buffers = False
+
+        # Render UTF-8 encoded byte strings instead of unicode. Text written
+        # to the output is encoded when the template is compiled and
+        # placeholders are encoded by the default filter, so the rendered
+        # page doesn't need a separate encoding pass. Values that skip the
+        # filter have to be byte strings already.
+        self.bytes_output = False
+
+        # Call cache_forever functions from the function registry that only
+        # have literal arguments at compile time, and write the result out as
+        # text. Only output that is never filtered is folded (skip_filter
+        # functions and |raw), since the filter applied at runtime isn't known
+        # until then.
+        self.fold_constant_placeholders = False
+
+        # Give each resolve_udn call site its own cache of how the name was
+        # found (attribute or item) on each type of object it has seen, see
+        # spitfire.runtime.udn.make_udn_inline_cache.
+        self.udn_inline_caches = False
+
+        # Give #for loops that look up names on their loop variable
+        # ($row.name) a second copy of the body for rows that are plain dicts,
+        # which looks the names up as keys instead of calling resolve_udn.
+        # Each row's type is checked, so rows of other types still work. Only
+        # applies when directly_access_defined_variables is on.
+        self.specialize_dict_loops = False
+
         self.__dict__.update(kargs)
 
     def update(self, **kargs):
@@ -199,6 +244,12 @@ def add_common_options(op):
     op.add_option('-V', '--version', action='store_true', default=False)
     op.add_option('-O', dest='optimizer_level', type='int', default=0)
     op.add_option('-o', '--output-file', dest='output_file', default=None)
+    op.add_option('--output-format',
+                  type='choice',
+                  choices=['py', 'pyc', 'both'],
+                  default='py',
+                  help='write generated templates as python source (py), '
+                  'ready to import bytecode (pyc) or both. default: py')
     op.add_option('--xspt-mode',
                   action='store_true',
                   default=False,
@@ -252,6 +303,14 @@ def add_common_options(op):
                   default=[],
                   help=AnalyzerOptions.get_help())
     op.add_option('--tune-gc', action='store_true')
+    op.add_option('--compile-cache-directory',
+                  default=None,
+                  action='callback',
+                  callback=validate_path,
+                  type='str',
+                  nargs=1,
+                  help='reuse generated code from this directory for '
+                  'templates whose inputs have not changed')
     op.add_option('--Wall',
                   action='store_true',
                   default=False,
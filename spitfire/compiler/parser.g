@@ -243,6 +243,17 @@ parser _SpitfireParser:
       {{ self.strip_whitespace = False }}
       END_DIRECTIVE SPACE 'strip_lines' CLOSE_END_DIRECTIVE {{ return _strip_lines_node }}
       |
+      'cache' {{ _cache_block = ast.CacheBlockNode() }}
+      (
+        SPACE ID ASSIGN_OPERATOR expression
+        {{ _cache_block.parameter_list.append(ast.ParameterNode(ID, expression)) }}
+      ) *
+      CLOSE_DIRECTIVE
+      {{ start = CLOSE_DIRECTIVE.endswith('\n') }}
+      ( block<<start>> {{ _cache_block.append(block) }} ) *
+      {{ self.make_optional(_cache_block.child_nodes, start) }}
+      END_DIRECTIVE SPACE 'cache' CLOSE_END_DIRECTIVE {{ return _cache_block }}
+      |
       'if' SPACE expression CLOSE_DIRECTIVE {{ _if_node = ast.IfNode(expression) }}
       {{ _last_condition_node = _if_node }}
       {{ start = CLOSE_DIRECTIVE.endswith('\n') }}
@@ -3,6 +3,8 @@
 # Use of this source code is governed by a BSD-style
 # license that can be found in the LICENSE file.
 
+import re
+
 from spitfire.compiler import parser
 from third_party.yapps2 import yappsrt
 
@@ -10,66 +12,142 @@ from third_party.yapps2 import yappsrt
 # determine what token to return. I'm not sure how fragille this is long-term,
 # but it seems to have been the right solution for a number of small problems
 # allong the way.
+#
+# Since the first match wins, the patterns allowed by a restriction can be
+# joined into one alternation that is tried in the same order. Each pattern
+# is wrapped in a group and the outermost group that matched identifies the
+# token, so a token costs one regexp.match call instead of one per pattern.
 _restrict_cache = {}
 
+# The parser never looks back more than one token, so only this many tokens
+# (and their restrictions) are kept around. It's generous so error messages
+# can still show the last few tokens that were scanned.
+_TOKEN_WINDOW = 16
+
+
+def _compile_patterns(patterns):
+    group_names = {}
+    parts = []
+    group_index = 1
+    for name, regexp in patterns:
+        group_names[group_index] = name
+        parts.append('(%s)' % regexp.pattern)
+        group_index += 1 + regexp.groups
+    return re.compile('|'.join(parts)), group_names
+
+
+class _TokenWindow(object):
+    """A list that only remembers its last few items.
+
+    Items keep the index they were appended at, so the scanner and parser can
+    keep using absolute token positions. Indexing an item that has been
+    dropped raises IndexError.
+    """
+
+    def __init__(self, size=_TOKEN_WINDOW):
+        self._size = size
+        self._offset = 0
+        self._items = []
+
+    def __len__(self):
+        return self._offset + len(self._items)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            start = max(start, self._offset)
+            stop = max(stop, self._offset)
+            return self._items[start - self._offset:stop - self._offset:step]
+        if i < 0:
+            i += len(self)
+        if i < self._offset:
+            raise IndexError('token %d is no longer available' % i)
+        return self._items[i - self._offset]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __repr__(self):
+        return repr(self._items)
+
+    def append(self, item):
+        items = self._items
+        items.append(item)
+        # trim in batches so appending stays cheap.
+        if len(items) >= 2 * self._size:
+            dropped = len(items) - self._size
+            del items[:dropped]
+            self._offset += dropped
+
 
 class SpitfireScanner(parser._SpitfireParserScanner):
 
+    def __init__(self, input):
+        parser._SpitfireParserScanner.__init__(self, input)
+        self.tokens = _TokenWindow()
+        self.restrictions = _TokenWindow()
+
+    def file_position(self, token_index):
+        tokens = self.tokens
+        j = token_index - tokens._offset
+        if 0 <= j < len(tokens._items):
+            return tokens._items[j][0]
+        return parser._SpitfireParserScanner.file_position(self, token_index)
+
     def token(self, i, restrict=0):
         """Get the i'th token, and if i is one past the end, then scan
         for another token; restrict is a list of tokens that
         are allowed, or 0 for any token."""
-        if i == len(self.tokens):
+        # this is called twice for every token the parser consumes, so it
+        # works on the windows' lists directly.
+        tokens = self.tokens
+        j = i - tokens._offset
+        if j == len(tokens._items):
             self.scan(restrict)
-        if i < len(self.tokens):
+            j = i - tokens._offset
+        if 0 <= j < len(tokens._items):
             # Make sure the restriction is more restricted
-            restriction = self.restrictions[i]
+            restriction = self.restrictions._items[j]
             if restrict and restriction:
                 if not restriction.issuperset(restrict):
                     raise NotImplementedError(
                         "Unimplemented: restriction set changed", restrict,
-                        self.restrictions[i])
-                return self.tokens[i]
+                        restriction)
+                return tokens._items[j]
             elif not restrict and not restriction:
-                return self.tokens[i]
+                return tokens._items[j]
         raise yappsrt.NoMoreTokens(i, len(self.tokens), self.tokens[i],
                                    restrict, self.restrictions[i], self.tokens)
 
     def scan(self, restrict):
         """Should scan another token and add it to the list, self.tokens,
         and add the restriction to self.restrictions"""
-        # Cache the list of patterns we check to avoid unnecessary iteration
         restrict = frozenset(restrict)
         try:
-            patterns = _restrict_cache[restrict]
+            regexp, group_names = _restrict_cache[restrict]
         except KeyError:
-            patterns = [pair
-                        for pair in self.patterns
-                        if not restrict or pair[0] in restrict]
-            _restrict_cache[restrict] = patterns
-
-        _input, _pos = self.input, self.pos
-        for best_pat, regexp in patterns:
-            m = regexp.match(_input, _pos)
-            if m:
-                tname = m.group(0)
-                best_match = len(tname)
-                # msolo: use the first match, not the 'best'
-                break
-        else:
+            regexp, group_names = _compile_patterns(
+                [pair
+                 for pair in self.patterns
+                 if not restrict or pair[0] in restrict])
+            _restrict_cache[restrict] = regexp, group_names
+
+        _pos = self.pos
+        m = regexp.match(self.input, _pos)
+        if not m:
             # If we didn't find anything, raise an error
             msg = "Bad Token"
             if restrict:
                 msg = "Trying to find one of " + ', '.join(restrict)
-            raise yappsrt.SyntaxError(self.pos, msg)
+            raise yappsrt.SyntaxError(_pos, msg)
 
         # Create a token with this data
-        end = _pos + best_match
-        token = (_pos, end, best_pat, tname)
+        end = m.end()
+        token = (_pos, end, group_names[m.lastindex], m.group(0))
         self.pos = end
         # Only add this token if it's not in the list
         # (to prevent looping)
-        if not self.tokens or token != self.tokens[-1]:
+        items = self.tokens._items
+        if not items or token != items[-1]:
             self.tokens.append(token)
             self.restrictions.append(restrict)
-        return
@@ -0,0 +1,98 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+import unittest
+
+from spitfire.compiler import parser
+from spitfire.compiler import scanner
+from third_party.yapps2 import yappsrt
+
+_TEMPLATES = [
+    'Hello $name!\n',
+    '#extends base\n#def header($title, $size=10)\n<h1>$title</h1>\n'
+    '#end def\n',
+    '#for $i, $item in $enumerate($items)\n'
+    '#if $i % 2 == 0 and not $item.hidden\n'
+    '  ${item.name|escape=False} $item[0] $item.call(1, -2.5, "x", k=[1, 2])\n'
+    '#elif $i in (1, 2)\n$i\n#else\n\\$literal \\\\ $$x\n#end if\n#end for\n',
+    '#set $x = {"a": 1, "b": $y} \n#filter html\n$x.a#slurp\n'
+    '## a comment\n#* block\ncomment *#\n#i18n()\nHi $name\n#end i18n\n',
+    '#import os.path\n#from spitfire.runtime import udn\n'
+    '#implements library\n#global $g\n#attr $a = 1\n',
+]
+
+
+class _RecordingScanner(scanner.SpitfireScanner):
+    """Keeps every token it scans, regardless of the scanner's window."""
+
+    def __init__(self, input):
+        scanner.SpitfireScanner.__init__(self, input)
+        self.all_tokens = []
+
+    def scan(self, restrict):
+        count = len(self.tokens)
+        scanner.SpitfireScanner.scan(self, restrict)
+        if len(self.tokens) > count:
+            self.all_tokens.append(self.tokens[-1])
+
+
+class _ReferenceScanner(parser._SpitfireParserScanner):
+    """Tries each pattern in order, like the scanner used to."""
+
+    def __init__(self, input):
+        parser._SpitfireParserScanner.__init__(self, input)
+        self.all_tokens = self.tokens
+
+    def scan(self, restrict):
+        for name, regexp in self.patterns:
+            if restrict and name not in restrict:
+                continue
+            m = regexp.match(self.input, self.pos)
+            if m:
+                break
+        else:
+            raise yappsrt.SyntaxError(self.pos, 'Bad Token')
+        token = (self.pos, m.end(), name, m.group(0))
+        self.pos = m.end()
+        if not self.tokens or token != self.tokens[-1]:
+            self.tokens.append(token)
+            self.restrictions.append(restrict)
+
+
+def _scan_all(scanner_class, src_text):
+    spt_scanner = scanner_class(src_text)
+    parser.SpitfireParser(spt_scanner).goal()
+    return spt_scanner.all_tokens
+
+
+class TestSpitfireScanner(unittest.TestCase):
+
+    def test_same_tokens_as_reference(self):
+        for src_text in _TEMPLATES:
+            self.assertEqual(
+                _scan_all(_RecordingScanner, src_text),
+                _scan_all(_ReferenceScanner, src_text))
+
+    def test_token_memory_is_bounded(self):
+        src_text = 'text $name\n' * 1000
+        spt_scanner = scanner.SpitfireScanner(src_text)
+        spt_parser = parser.SpitfireParser(spt_scanner)
+        spt_parser.goal()
+        self.assertTrue(len(spt_scanner.tokens) > 4000)
+        self.assertTrue(len(list(spt_scanner.tokens)) < 4 *
+                        scanner._TOKEN_WINDOW)
+        self.assertEqual(spt_scanner.tokens[-1][2], 'END')
+        self.assertEqual(len(spt_scanner.tokens[-10:]), 10)
+        self.assertRaises(IndexError, spt_scanner.tokens.__getitem__, 0)
+
+    def test_syntax_error(self):
+        spt_scanner = scanner.SpitfireScanner('#if $x\n$y(\n#end if\n')
+        spt_parser = parser.SpitfireParser(spt_scanner)
+        self.assertRaises(yappsrt.FatalParseError, yappsrt.wrap_error_reporter,
+                          spt_parser, 'goal')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,11 +3,17 @@
 # Use of this source code is governed by a BSD-style
 # license that can be found in the LICENSE file.
 
+import array
+import bisect
+import imp
 import logging
+import marshal
 import new
 import os.path
 import re
+import struct
 import sys
+import time
 
 from spitfire.compiler import options
 from spitfire.compiler import parser
@@ -54,6 +60,40 @@ def parse_template(src_text, xspt_mode=False):
         return parse(src_text)
 
 
+class LineIndex(object):
+    """Maps offsets in a template's source to line and column numbers.
+
+    Only the offset of each newline is stored, so building the index is a
+    single pass over the text and each lookup is a binary search.
+    """
+
+    def __init__(self, src_text):
+        self._newline_offsets = array.array('l')
+        append = self._newline_offsets.append
+        find = src_text.find
+        pos = find('\n')
+        while pos != -1:
+            append(pos)
+            pos = find('\n', pos + 1)
+
+    def __len__(self):
+        return len(self._newline_offsets) + 1
+
+    def get_line(self, pos):
+        """Return the 1-based line that contains the offset pos."""
+        return 1 + bisect.bisect_left(self._newline_offsets, pos)
+
+    def get_line_and_column(self, pos):
+        newline_count = bisect.bisect_left(self._newline_offsets, pos)
+        if newline_count:
+            line_start = self._newline_offsets[newline_count - 1] + 1
+        else:
+            line_start = 0
+        # columns have always been reported one less than the offset into
+        # the line.
+        return (1 + newline_count, pos - line_start - 1)
+
+
 def read_template_file(filename):
     f = open(filename, 'r')
     try:
@@ -145,6 +185,32 @@ def load_module_from_src(src_code, filename, module_name):
     return module
 
 
+# write a ready to import .pyc file for generated source code, so the first
+# import of a template doesn't have to parse python again. src_path is where
+# the .py file lives (or would live) - it becomes the filename of the code
+# object, so tracebacks report line numbers in the generated source and they
+# still line up with any sourcemap comments.
+def write_bytecode_file(src_code, src_path):
+    bytecode = compile(src_code, src_path, 'exec')
+    # python only uses the timestamp to check a .pyc against its .py
+    if os.path.exists(src_path):
+        mtime = int(os.path.getmtime(src_path))
+    else:
+        mtime = int(time.time())
+    f = open(src_path + 'c', 'wb')
+    try:
+        # like py_compile, write the magic number last so a partially written
+        # file is never mistaken for a valid one.
+        f.write('\0\0\0\0')
+        f.write(struct.pack('<I', mtime & 0xFFFFFFFF))
+        marshal.dump(bytecode, f)
+        f.flush()
+        f.seek(0, 0)
+        f.write(imp.get_magic())
+    finally:
+        f.close()
+
+
 # convert and extends path to a file path
 def extends2path(class_extend):
     return class_extend.replace('.', '/') + '.spt'
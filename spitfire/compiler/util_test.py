@@ -0,0 +1,89 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+import imp
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from spitfire.compiler import compiler
+from spitfire.compiler import options
+from spitfire.compiler import util
+
+
+class WriteBytecodeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.template_path = os.path.join(self.temp_dir, 'bytecode_tmpl.spt')
+        f = open(self.template_path, 'w')
+        f.write('#def greet($name)\nHello $name!\n#end def\n')
+        f.close()
+        self.src_path = os.path.join(self.temp_dir, 'bytecode_tmpl.py')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _compile(self, output_format):
+        spt_compiler = compiler.Compiler(
+            analyzer_options=options.default_options,
+            output_format=output_format,
+            include_sourcemap=True,
+            write_file=True)
+        spt_compiler.compile_file(self.template_path)
+
+    def test_pyc_only(self):
+        self._compile('pyc')
+        self.assertFalse(os.path.exists(self.src_path))
+        module = imp.load_compiled('bytecode_tmpl', self.src_path + 'c')
+        template = module.bytecode_tmpl()
+        self.assertEqual(template.greet('world'), 'Hello world!\n')
+        self.assertEqual(template.greet.im_func.func_code.co_filename,
+                         self.src_path)
+
+    def test_both(self):
+        self._compile('both')
+        f = open(self.src_path + 'c', 'rb')
+        header = f.read(8)
+        f.close()
+        self.assertEqual(header[:4], imp.get_magic())
+        self.assertEqual(
+            struct.unpack('<I', header[4:])[0],
+            int(os.path.getmtime(self.src_path)))
+
+    def test_py_only(self):
+        self._compile('py')
+        self.assertTrue(os.path.exists(self.src_path))
+        self.assertFalse(os.path.exists(self.src_path + 'c'))
+
+
+class LineIndexTest(unittest.TestCase):
+
+    def test_get_line(self):
+        src_text = 'one\ntwo\n\nfour'
+        line_index = util.LineIndex(src_text)
+        self.assertEqual(len(line_index), 4)
+        expected_line = 1
+        for pos, c in enumerate(src_text):
+            self.assertEqual(line_index.get_line(pos), expected_line)
+            if c == '\n':
+                expected_line += 1
+
+    def test_get_line_and_column(self):
+        line_index = util.LineIndex('ab\ncd')
+        self.assertEqual(line_index.get_line_and_column(0), (1, -1))
+        self.assertEqual(line_index.get_line_and_column(2), (1, 1))
+        self.assertEqual(line_index.get_line_and_column(4), (2, 0))
+
+    def test_no_newlines(self):
+        line_index = util.LineIndex('just text')
+        self.assertEqual(len(line_index), 1)
+        self.assertEqual(line_index.get_line(5), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -92,3 +92,17 @@ def cache_forever(function):
 def never_cache(function):
     function.never_cache = True
     return function
+
+
+# decorate a function object so its result is cached by argument for the life
+# of a template instance.
+def memoize_per_render(function):
+    function.memoize_per_render = True
+    return function
+
+
+# decorate a function object so calls with only constant arguments are made
+# once at compile time and the result is inlined into the template.
+def pure(function):
+    function.pure = True
+    return function
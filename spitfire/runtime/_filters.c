@@ -0,0 +1,196 @@
+// Copyright 2016 The Spitfire Authors. All Rights Reserved.
+//
+// Use of this source code is governed by a BSD-style
+// license that can be found in the LICENSE file.
+
+#include <Python.h>
+
+// The types simple_str_filter converts with str(): (str, unicode, int, long,
+// float, runtime.UndefinedPlaceholder).
+static PyObject *primitive_types = NULL;
+
+
+/* The original Python function:
+def simple_str_filter(value):
+    """Return a string if the input type is something primitive."""
+    if isinstance(value, (str, unicode, int, long, float,
+                          runtime.UndefinedPlaceholder)):
+        return str(value)
+    else:
+        return ''
+*/
+static PyObject *
+simple_str_filter(PyObject *self, PyObject *value)
+{
+  int is_primitive;
+  // str() of a str is the same object.
+  if (PyString_CheckExact(value)) {
+    Py_INCREF(value);
+    return value;
+  }
+  if (PyUnicode_Check(value) || PyInt_Check(value) || PyLong_Check(value) ||
+      PyFloat_Check(value) || PyString_Check(value)) {
+    return PyObject_Str(value);
+  }
+  // isinstance also honors __class__, so ask it about everything else.
+  is_primitive = PyObject_IsInstance(value, primitive_types);
+  if (is_primitive < 0) {
+    return NULL;
+  }
+  if (is_primitive) {
+    return PyObject_Str(value);
+  }
+  return PyString_FromString("");
+}
+
+
+/* The original Python function:
+@skip_filter
+def escape_html(value, quote=True):
+    """Replace special characters '&', '<' and '>' by SGML entities."""
+    if type(value) is not str:
+        value = simple_str_filter(value)
+    if '&' in value:
+        value = value.replace("&", "&amp;")  # Must be done first!
+    if '<' in value:
+        value = value.replace("<", "&lt;")
+    if '>' in value:
+        value = value.replace(">", "&gt;")
+    if quote and '"' in value:
+        value = value.replace('"', "&quot;")
+    return value
+*/
+// Since '&' is replaced first, replacing every character in a single pass
+// gives the same result as the chain of replaces.
+static PyObject *
+escape_html(PyObject *self, PyObject *args, PyObject *kwargs)
+{
+  static char *kwlist[] = {"value", "quote", NULL};
+  PyObject *value;
+  PyObject *quote_obj = NULL;
+  PyObject *result;
+  int quote = 1;
+  const char *src;
+  char *dst;
+  Py_ssize_t size, new_size, i;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "O|O:escape_html", kwlist,
+                                   &value, &quote_obj)) {
+    return NULL;
+  }
+  if (quote_obj != NULL) {
+    quote = PyObject_IsTrue(quote_obj);
+    if (quote < 0) {
+      return NULL;
+    }
+  }
+
+  if (PyString_CheckExact(value)) {
+    Py_INCREF(value);
+  } else {
+    value = simple_str_filter(NULL, value);
+    if (value == NULL) {
+      return NULL;
+    }
+    if (!PyString_Check(value)) {
+      PyErr_SetString(PyExc_TypeError, "expected a str");
+      Py_DECREF(value);
+      return NULL;
+    }
+  }
+
+  src = PyString_AS_STRING(value);
+  size = PyString_GET_SIZE(value);
+  new_size = size;
+  for (i = 0; i < size; i++) {
+    // Each character grows by at most 5 bytes.
+    if (new_size > PY_SSIZE_T_MAX - 5) {
+      Py_DECREF(value);
+      return PyErr_NoMemory();
+    }
+    switch (src[i]) {
+      case '&':
+        new_size += 4;
+        break;
+      case '<':
+      case '>':
+        new_size += 3;
+        break;
+      case '"':
+        if (quote) {
+          new_size += 5;
+        }
+        break;
+    }
+  }
+  // Most values have nothing to escape.
+  if (new_size == size) {
+    return value;
+  }
+
+  result = PyString_FromStringAndSize(NULL, new_size);
+  if (result == NULL) {
+    Py_DECREF(value);
+    return NULL;
+  }
+  dst = PyString_AS_STRING(result);
+  for (i = 0; i < size; i++) {
+    switch (src[i]) {
+      case '&':
+        memcpy(dst, "&amp;", 5);
+        dst += 5;
+        break;
+      case '<':
+        memcpy(dst, "&lt;", 4);
+        dst += 4;
+        break;
+      case '>':
+        memcpy(dst, "&gt;", 4);
+        dst += 4;
+        break;
+      case '"':
+        if (quote) {
+          memcpy(dst, "&quot;", 6);
+          dst += 6;
+          break;
+        }
+        // Fall through.
+      default:
+        *dst++ = src[i];
+    }
+  }
+  Py_DECREF(value);
+  return result;
+}
+
+
+// Function registration table: name-string -> function-pointer
+static struct PyMethodDef filters_functions[] = {
+  {"_simple_str_filter", (PyCFunction)simple_str_filter, METH_O},
+  {"_escape_html", (PyCFunction)escape_html, METH_VARARGS | METH_KEYWORDS},
+  {NULL, NULL}
+};
+
+PyMODINIT_FUNC
+init_filters(void)
+{
+  PyObject *runtime_module;
+  PyObject *undefined_placeholder;
+
+  runtime_module = PyImport_ImportModule("spitfire.runtime");
+  if (runtime_module == NULL)
+    return;
+  undefined_placeholder = PyObject_GetAttrString(runtime_module,
+                                                 "UndefinedPlaceholder");
+  Py_DECREF(runtime_module);
+  if (undefined_placeholder == NULL)
+    return;
+  primitive_types = PyTuple_Pack(6, &PyString_Type, &PyUnicode_Type,
+                                 &PyInt_Type, &PyLong_Type, &PyFloat_Type,
+                                 undefined_placeholder);
+  Py_DECREF(undefined_placeholder);
+  if (primitive_types == NULL)
+    return;
+
+  Py_InitModule3("_filters", filters_functions, "Filters Module");
+}
@@ -0,0 +1,173 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+"""Bundle a tree of compiled templates into one file and import from it.
+
+A bundle holds a marshalled code object for every module in a compiled
+template tree and an index of module name to offset. install() puts an
+importer on sys.meta_path that maps the bundle into memory once and only
+unmarshals a module the first time it is imported. A process can then load
+templates without any stat or open calls on the template directory tree.
+"""
+
+import imp
+import marshal
+import mmap
+import os
+import os.path
+import struct
+import sys
+
+_MAGIC = 'SPTB'
+# bundle magic, python bytecode magic, index offset, index length
+_HEADER = struct.Struct('<4s4sQQ')
+
+
+class BundleError(Exception):
+    pass
+
+
+def write_bundle(bundle_path, modules):
+    """Write a bundle file.
+
+    Args:
+        bundle_path: The file to write.
+        modules: An iterable of (module_name, code, package_path) tuples.
+            package_path is None for a plain module, or the directory to use
+            as the __path__ of a package.
+    """
+    index = {}
+    f = open(bundle_path, 'wb')
+    try:
+        # the real header is written once the index offset is known.
+        f.write(_HEADER.pack(_MAGIC, imp.get_magic(), 0, 0))
+        for module_name, code, package_path in modules:
+            data = marshal.dumps(code)
+            index[module_name] = (f.tell(), len(data), package_path)
+            f.write(data)
+        index_data = marshal.dumps(index)
+        index_offset = f.tell()
+        f.write(index_data)
+        f.seek(0, 0)
+        f.write(_HEADER.pack(_MAGIC, imp.get_magic(), index_offset,
+                             len(index_data)))
+    finally:
+        f.close()
+
+
+def _load_code(path):
+    if path.endswith('.pyc'):
+        f = open(path, 'rb')
+        try:
+            if f.read(4) != imp.get_magic():
+                raise BundleError('%s was compiled by another python version' %
+                                  path)
+            f.read(4)
+            return marshal.load(f)
+        finally:
+            f.close()
+    f = open(path, 'rU')
+    try:
+        return compile(f.read(), path, 'exec')
+    finally:
+        f.close()
+
+
+def _iter_modules(directory, package_name):
+    # prefer source, but also take .pyc files that have no source, like the
+    # ones spitfire-compile --output-format=pyc writes.
+    paths = {}
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        module_name, ext = os.path.splitext(name)
+        if os.path.isdir(path):
+            init_path = os.path.join(path, '__init__.py')
+            if not os.path.exists(init_path):
+                init_path += 'c'
+                if not os.path.exists(init_path):
+                    continue
+            subpackage_name = '.'.join(filter(None, [package_name, name]))
+            yield (subpackage_name, _load_code(init_path),
+                   os.path.abspath(path))
+            for module in _iter_modules(path, subpackage_name):
+                yield module
+        elif module_name != '__init__' and (
+                ext == '.py' or (ext == '.pyc' and module_name not in paths)):
+            paths[module_name] = path
+    for module_name, path in sorted(paths.iteritems()):
+        yield ('.'.join(filter(None, [package_name, module_name])),
+               _load_code(path), None)
+
+
+def bundle_directory(bundle_path, root_dir):
+    """Bundle every module under root_dir, named relative to root_dir.
+
+    As with a normal import, only directories with an __init__ module are
+    treated as packages.
+    """
+    write_bundle(bundle_path, _iter_modules(root_dir, ''))
+
+
+class BundleImporter(object):
+    """A PEP 302 importer for the modules in a bundle."""
+
+    def __init__(self, bundle_path):
+        self.bundle_path = bundle_path
+        f = open(bundle_path, 'rb')
+        try:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        magic, python_magic, index_offset, index_length = _HEADER.unpack(
+            self._map[:_HEADER.size])
+        if magic != _MAGIC:
+            raise BundleError('%s is not a template bundle' % bundle_path)
+        if python_magic != imp.get_magic():
+            raise BundleError('%s was built by another python version' %
+                              bundle_path)
+        self._index = marshal.loads(
+            self._map[index_offset:index_offset + index_length])
+
+    def __contains__(self, module_name):
+        return module_name in self._index
+
+    def find_module(self, fullname, path=None):
+        if fullname in self._index:
+            return self
+        return None
+
+    def load_module(self, fullname):
+        if fullname in sys.modules:
+            return sys.modules[fullname]
+        offset, length, package_path = self._index[fullname]
+        code = marshal.loads(self._map[offset:offset + length])
+        module = imp.new_module(fullname)
+        module.__file__ = code.co_filename
+        module.__loader__ = self
+        if package_path is not None:
+            # submodules that aren't in the bundle can still be found in the
+            # package's original directory.
+            module.__path__ = [package_path]
+            module.__package__ = fullname
+        else:
+            module.__package__ = fullname.rpartition('.')[0]
+        sys.modules[fullname] = module
+        try:
+            exec code in module.__dict__
+        except:
+            del sys.modules[fullname]
+            raise
+        return sys.modules[fullname]
+
+
+def install(bundle_path):
+    """Import modules from bundle_path ahead of the normal import path."""
+    importer = BundleImporter(bundle_path)
+    sys.meta_path.insert(0, importer)
+    return importer
+
+
+def uninstall(importer):
+    sys.meta_path.remove(importer)
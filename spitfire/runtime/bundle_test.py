@@ -0,0 +1,83 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from spitfire.compiler import compiler
+from spitfire.compiler import options
+from spitfire.runtime import bundle
+
+
+class BundleTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.root_dir = os.path.join(self.temp_dir, 'compiled')
+        package_dir = os.path.join(self.root_dir, 'bundle_pkg')
+        os.makedirs(package_dir)
+        self._write(os.path.join(package_dir, '__init__.py'), '')
+        self._write(os.path.join(self.root_dir, 'not_a_package', 'x.py'), '')
+        self._compile(os.path.join(package_dir, 'bundle_base.spt'),
+                      '#def greet($name)\nHello $name!\n#end def\n')
+        self._compile(os.path.join(package_dir, 'bundle_page.spt'),
+                      '#extends bundle_pkg.bundle_base\n'
+                      '#def main\n$greet("bundle")#end def\n',
+                      output_format='pyc')
+        self.bundle_path = os.path.join(self.temp_dir, 'templates.bundle')
+        bundle.bundle_directory(self.bundle_path, self.root_dir)
+        self.importer = bundle.install(self.bundle_path)
+
+    def tearDown(self):
+        bundle.uninstall(self.importer)
+        for module_name in sys.modules.keys():
+            if module_name.startswith('bundle_pkg'):
+                del sys.modules[module_name]
+        shutil.rmtree(self.temp_dir)
+
+    def _write(self, path, text):
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        f = open(path, 'w')
+        f.write(text)
+        f.close()
+
+    def _compile(self, path, src_text, output_format='py'):
+        self._write(path, src_text)
+        spt_compiler = compiler.Compiler(
+            analyzer_options=options.default_options,
+            output_format=output_format,
+            write_file=True)
+        spt_compiler.compile_file(path)
+        os.unlink(path)
+
+    def test_index(self):
+        self.assertTrue('bundle_pkg' in self.importer)
+        self.assertTrue('bundle_pkg.bundle_base' in self.importer)
+        self.assertTrue('bundle_pkg.bundle_page' in self.importer)
+        self.assertFalse('not_a_package.x' in self.importer)
+
+    def test_import_is_lazy(self):
+        import bundle_pkg
+        self.assertEqual(bundle_pkg.__loader__, self.importer)
+        self.assertFalse('bundle_pkg.bundle_page' in sys.modules)
+
+    def test_import_from_bundle(self):
+        # remove the compiled tree to show the bundle is self contained.
+        shutil.rmtree(self.root_dir)
+        from bundle_pkg import bundle_page
+        self.assertEqual(bundle_page.bundle_page().main(), 'Hello bundle!\n')
+
+    def test_bad_file(self):
+        self._write(self.bundle_path, 'not a bundle' * 4)
+        self.assertRaises(bundle.BundleError, bundle.BundleImporter,
+                          self.bundle_path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+# bounded caches used by templates at runtime.
+
+import collections
+import threading
+import time
+import weakref
+
+# the number of fragments the default fragment cache holds.
+DEFAULT_FRAGMENT_CACHE_SIZE = 1024
+
+
+class LRUCache(object):
+    """A dict-like cache that holds at most max_size items.
+
+    When the cache is full, the least recently used item is discarded to make
+    room for a new one.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._data = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __getitem__(self, key):
+        # move the item to the end so it's the last one discarded.
+        value = self._data.pop(key)
+        self._data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        data = self._data
+        if key in data:
+            del data[key]
+        elif len(data) >= self.max_size:
+            data.popitem(last=False)
+        data[key] = value
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def clear(self):
+        self._data.clear()
+
+
+class FragmentCache(object):
+    """The default backend for #cache blocks.
+
+    An in-process LRU cache whose entries can expire. Any object with the same
+    get and set methods can be used as a backend instead, for instance a
+    client for an external store shared between processes:
+
+      get(key) returns the value stored for key, or None.
+      set(key, value, ttl) stores value for ttl seconds, or forever if ttl is
+      None or 0.
+
+    Keys are strings and values are rendered template output.
+    """
+
+    def __init__(self, max_size=DEFAULT_FRAGMENT_CACHE_SIZE, clock=time.time):
+        self._cache = LRUCache(max_size)
+        self._clock = clock
+        # the cache is shared by every template rendered in this process.
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= self._clock():
+                del self._cache[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            expires = self._clock() + ttl
+        else:
+            expires = None
+        with self._lock:
+            self._cache[key] = (value, expires)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_fragment_cache = FragmentCache()
+
+
+def get_fragment_cache():
+    return _fragment_cache
+
+
+# replace the backend used by templates that weren't given one.
+def set_fragment_cache(fragment_cache):
+    global _fragment_cache
+    _fragment_cache = fragment_cache
+
+
+# every CachedIdentifierStore that's been created, so they can all be cleared
+# when the data they were computed from changes.
+_cached_identifier_stores = weakref.WeakSet()
+
+
+class CachedIdentifierStore(object):
+    """Holds the values of a template module's cached placeholders.
+
+    The values live in the module globals, so generated code reads them like
+    any other global, but they are set through the store. That lets the store
+    report what's cached, limit how many values are kept and reset them to
+    None so they are computed again on the next render.
+    """
+
+    def __init__(self, module_globals, names, max_size=None, version=None):
+        self._globals = module_globals
+        self.names = tuple(names)
+        self.max_size = max_size
+        self.version = version
+        # names that have been set, oldest first.
+        self._set_names = collections.OrderedDict()
+        self._lock = threading.Lock()
+        _cached_identifier_stores.add(self)
+
+    def __len__(self):
+        return len(self._set_names)
+
+    def items(self):
+        return [(name, self._globals[name]) for name in self._set_names]
+
+    def set(self, name, value):
+        with self._lock:
+            if name in self._set_names:
+                del self._set_names[name]
+            elif (self.max_size is not None and
+                  len(self._set_names) >= self.max_size):
+                oldest_name, _ = self._set_names.popitem(last=False)
+                self._globals[oldest_name] = None
+            self._set_names[name] = True
+            self._globals[name] = value
+        return value
+
+    def clear(self):
+        with self._lock:
+            for name in self._set_names:
+                self._globals[name] = None
+            self._set_names.clear()
+
+    # values computed for another version (a previous deploy's data or
+    # another locale, for example) are thrown away.
+    def set_version(self, version):
+        if version != self.version:
+            self.clear()
+            self.version = version
+
+
+def get_cached_identifier_stores():
+    return list(_cached_identifier_stores)
+
+
+def clear_cached_identifiers():
+    for store in get_cached_identifier_stores():
+        store.clear()
@@ -0,0 +1,118 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+import unittest
+
+from spitfire.runtime import cache
+
+
+class LRUCacheTest(unittest.TestCase):
+
+    def test_get_set(self):
+        lru = cache.LRUCache(2)
+        lru['a'] = 1
+        self.assertEqual(lru['a'], 1)
+        self.assertEqual(lru.get('b'), None)
+        self.assertRaises(KeyError, lambda: lru['b'])
+        lru['a'] = 2
+        self.assertEqual(lru['a'], 2)
+        self.assertEqual(len(lru), 1)
+
+    def test_discards_least_recently_used(self):
+        lru = cache.LRUCache(2)
+        lru['a'] = 1
+        lru['b'] = 2
+        lru['a']
+        lru['c'] = 3
+        self.assertTrue('a' in lru)
+        self.assertFalse('b' in lru)
+        self.assertTrue('c' in lru)
+        self.assertEqual(len(lru), 2)
+
+    def test_clear(self):
+        lru = cache.LRUCache(2)
+        lru['a'] = 1
+        del lru['a']
+        self.assertFalse('a' in lru)
+        lru['b'] = 2
+        lru.clear()
+        self.assertEqual(len(lru), 0)
+
+
+class FragmentCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 100
+        self.fragment_cache = cache.FragmentCache(max_size=2,
+                                                  clock=lambda: self.now)
+
+    def test_get_set(self):
+        self.assertEqual(self.fragment_cache.get('a'), None)
+        self.fragment_cache.set('a', 'x')
+        self.assertEqual(self.fragment_cache.get('a'), 'x')
+        self.fragment_cache.clear()
+        self.assertEqual(self.fragment_cache.get('a'), None)
+
+    def test_ttl(self):
+        self.fragment_cache.set('a', 'x', 10)
+        self.fragment_cache.set('b', 'y')
+        self.now = 109
+        self.assertEqual(self.fragment_cache.get('a'), 'x')
+        self.now = 110
+        self.assertEqual(self.fragment_cache.get('a'), None)
+        self.assertEqual(self.fragment_cache.get('b'), 'y')
+
+    def test_set_fragment_cache(self):
+        default_fragment_cache = cache.get_fragment_cache()
+        try:
+            cache.set_fragment_cache(self.fragment_cache)
+            self.assertTrue(cache.get_fragment_cache() is self.fragment_cache)
+        finally:
+            cache.set_fragment_cache(default_fragment_cache)
+
+
+class CachedIdentifierStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.module_globals = {'a': None, 'b': None}
+        self.store = cache.CachedIdentifierStore(self.module_globals,
+                                                 ('a', 'b'))
+
+    def test_set(self):
+        self.assertEqual(self.store.set('a', 1), 1)
+        self.assertEqual(self.module_globals['a'], 1)
+        self.assertEqual(len(self.store), 1)
+        self.assertEqual(self.store.items(), [('a', 1)])
+
+    def test_clear(self):
+        self.store.set('a', 1)
+        self.store.clear()
+        self.assertEqual(self.module_globals, {'a': None, 'b': None})
+        self.assertEqual(len(self.store), 0)
+
+    def test_max_size(self):
+        self.store.max_size = 1
+        self.store.set('a', 1)
+        self.store.set('b', 2)
+        self.assertEqual(self.module_globals, {'a': None, 'b': 2})
+        self.assertEqual(len(self.store), 1)
+
+    def test_set_version(self):
+        self.store.set('a', 1)
+        self.store.set_version(None)
+        self.assertEqual(self.module_globals['a'], 1)
+        self.store.set_version('fr')
+        self.assertEqual(self.module_globals['a'], None)
+        self.assertEqual(self.store.version, 'fr')
+
+    def test_clear_cached_identifiers(self):
+        self.store.set('a', 1)
+        self.assertTrue(self.store in cache.get_cached_identifier_stores())
+        cache.clear_cached_identifiers()
+        self.assertEqual(self.module_globals['a'], None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,9 +6,15 @@
 # a few helpful filter functions
 
 import functools
+import logging
 import types
 from spitfire import runtime
 from spitfire.runtime import udn
+# Import the accelerated C module if available.
+try:
+    from spitfire.runtime import _filters
+except ImportError:
+    _filters = None
 
 
 # decorate a function object so the default filter will not be applied to the
@@ -36,13 +42,22 @@ def passthrough_filter(value):
 @skip_filter
 def escape_html(value, quote=True):
     """Replace special characters '&', '<' and '>' by SGML entities."""
-    value = simple_str_filter(value)
-    if isinstance(value, basestring):
+    return _escape_html(value, quote)
+
+
+def _python_escape_html(value, quote=True):
+    if type(value) is not str:
+        value = simple_str_filter(value)
+    # most values have nothing to escape, and checking is much cheaper than
+    # a replace that copies the string.
+    if '&' in value:
         value = value.replace("&", "&amp;")  # Must be done first!
+    if '<' in value:
         value = value.replace("<", "&lt;")
+    if '>' in value:
         value = value.replace(">", "&gt;")
-        if quote:
-            value = value.replace('"', "&quot;")
+    if quote and '"' in value:
+        value = value.replace('"', "&quot;")
     return value
 
 
@@ -56,7 +71,7 @@ def safe_values(value):
         return ''
 
 
-def simple_str_filter(value):
+def _python_simple_str_filter(value):
     """Return a string if the input type is something primitive."""
     if isinstance(value, (str, unicode, int, long, float,
                           runtime.UndefinedPlaceholder)):
@@ -67,6 +82,52 @@ def simple_str_filter(value):
         return ''
 
 
+def utf8_str_filter(value):
+    """Like simple_str_filter, but encodes unicode values as UTF-8."""
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    elif isinstance(value, (str, int, long, float,
+                            runtime.UndefinedPlaceholder)):
+        return str(value)
+    else:
+        return ''
+
+
+# Define Python/C alternates.
+if _filters:
+    _c_simple_str_filter = _filters._simple_str_filter
+    _c_escape_html = _filters._escape_html
+
+# Set default functions.
+simple_str_filter = _python_simple_str_filter
+_escape_html = _python_escape_html
+
+
+def set_accelerator(enabled=True):
+    """Use the C versions of simple_str_filter and escape_html if they're
+    available. They return the same output as the Python versions.
+
+    Templates bind simple_str_filter as their default filter when their base
+    class is defined, so this should be called before templates are loaded.
+    """
+    global simple_str_filter
+    global _escape_html
+
+    if enabled and _filters:
+        simple_str_filter = _c_simple_str_filter
+        _escape_html = _c_escape_html
+    else:
+        simple_str_filter = _python_simple_str_filter
+        _escape_html = _python_escape_html
+
+    if enabled and _filters is None:
+        logging.warning(
+            'unable to enable acceleration, _filters module not loaded')
+
+# give it our best shot
+set_accelerator()
+
+
 # test function for function registry - don't use
 @skip_filter
 def escape_html_function(value):
@@ -0,0 +1,138 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+import unittest
+
+from spitfire import runtime
+from spitfire.runtime import filters
+try:
+    from spitfire.runtime import _filters  # pylint: disable=g-import-not-at-top
+except ImportError:
+    _filters = None
+
+
+class _Str(str):
+    pass
+
+
+class _Int(int):
+
+    def __str__(self):
+        return 'int'
+
+
+class _FakeStr(object):
+    # isinstance checks __class__ as well as the type.
+    __class__ = str
+
+    def __str__(self):
+        return 'fake'
+
+
+# values with and without characters to escape, of all the types the filters
+# treat differently.
+_VALUES = ['', 'plain', '<a href="x">&amp;</a>', '"', 'a\0<b', '\xff&',
+           _Str('s<'), u'', u'u>', 1, -2L, 1.5, True, _Int(3), _FakeStr(),
+           None, [1], object()]
+
+
+class _SimpleStrFilterTest(object):
+
+    def test_str(self):
+        self.assertEqual(self.simple_str_filter('a<'), 'a<')
+        self.assertEqual(type(self.simple_str_filter(_Str('a'))), str)
+
+    def test_primitive(self):
+        self.assertEqual(self.simple_str_filter(u'a'), 'a')
+        self.assertEqual(self.simple_str_filter(3), '3')
+        self.assertEqual(self.simple_str_filter(3L), '3')
+        self.assertEqual(self.simple_str_filter(1.5), '1.5')
+        self.assertEqual(self.simple_str_filter(False), 'False')
+        self.assertEqual(self.simple_str_filter(_Int(3)), 'int')
+        self.assertEqual(self.simple_str_filter(_FakeStr()), 'fake')
+
+    def test_other(self):
+        self.assertEqual(self.simple_str_filter(None), '')
+        self.assertEqual(self.simple_str_filter([1]), '')
+
+    def test_errors(self):
+        self.assertRaises(runtime.PlaceholderError, self.simple_str_filter,
+                          runtime.UndefinedPlaceholder('a', []))
+        self.assertRaises(UnicodeEncodeError, self.simple_str_filter, u'\xfc')
+
+
+class _EscapeHtmlTest(object):
+
+    def test_escape(self):
+        self.assertEqual(self.escape_html('<a href="x">&</a>'),
+                         '&lt;a href=&quot;x&quot;&gt;&amp;&lt;/a&gt;')
+        self.assertEqual(self.escape_html('"&amp;"', quote=False),
+                         '"&amp;amp;"')
+        self.assertEqual(self.escape_html('"', 0), '"')
+
+    def test_nothing_to_escape(self):
+        self.assertEqual(self.escape_html('plain'), 'plain')
+        self.assertEqual(self.escape_html(''), '')
+
+    def test_non_str(self):
+        self.assertEqual(self.escape_html(u'a<b'), 'a&lt;b')
+        self.assertEqual(type(self.escape_html(u'a<b')), str)
+        self.assertEqual(self.escape_html(3), '3')
+        self.assertEqual(self.escape_html(1.5), '1.5')
+        self.assertEqual(self.escape_html(None), '')
+        self.assertEqual(self.escape_html([1]), '')
+        self.assertRaises(runtime.PlaceholderError, self.escape_html,
+                          runtime.UndefinedPlaceholder('a', []))
+
+
+class TestSimpleStrFilterPy(_SimpleStrFilterTest, unittest.TestCase):
+    simple_str_filter = staticmethod(filters._python_simple_str_filter)
+
+
+class TestEscapeHtmlPy(_EscapeHtmlTest, unittest.TestCase):
+    escape_html = staticmethod(filters._python_escape_html)
+
+
+if _filters is not None:
+
+    class TestSimpleStrFilterC(_SimpleStrFilterTest, unittest.TestCase):
+        simple_str_filter = staticmethod(_filters._simple_str_filter)
+
+    class TestEscapeHtmlC(_EscapeHtmlTest, unittest.TestCase):
+        escape_html = staticmethod(_filters._escape_html)
+
+    class TestParity(unittest.TestCase):
+
+        def test_simple_str_filter(self):
+            for value in _VALUES:
+                self.assertEqual(_filters._simple_str_filter(value),
+                                 filters._python_simple_str_filter(value))
+
+        def test_escape_html(self):
+            for value in _VALUES:
+                for quote in (True, False):
+                    self.assertEqual(
+                        _filters._escape_html(value, quote),
+                        filters._python_escape_html(value, quote))
+
+
+class TestEscapeHtml(unittest.TestCase):
+
+    def test_skip_filter(self):
+        self.assertTrue(filters.escape_html.skip_filter)
+
+    def test_accelerator(self):
+        try:
+            filters.set_accelerator(False)
+            self.assertEqual(filters.escape_html('<'), '&lt;')
+            self.assertTrue(filters.simple_str_filter is
+                            filters._python_simple_str_filter)
+        finally:
+            filters.set_accelerator()
+        self.assertEqual(filters.escape_html('<'), '&lt;')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+"""Proxies for template imports that are resolved the first time they're used.
+
+Templates compiled with the lazy_imports option bind each #import name and
+each function registry import to one of these proxies instead of importing it
+when the module loads. The first attribute access or call imports the target
+and rebinds the global name to the real object, so later lookups never go
+through the proxy.
+"""
+
+_UNRESOLVED = object()
+
+
+class _LazyImport(object):
+    # slots keep the proxy's own state out of the way of the attributes it
+    # forwards to the imported object.
+    __slots__ = ('_lazy_globals', '_lazy_name', '_lazy_value')
+
+    def __init__(self, module_globals, name):
+        self._lazy_globals = module_globals
+        self._lazy_name = name
+        self._lazy_value = _UNRESOLVED
+
+    def _lazy_resolve(self):
+        value = self._lazy_value
+        if value is _UNRESOLVED:
+            value = self._lazy_value = self._lazy_import()
+            if self._lazy_globals.get(self._lazy_name) is self:
+                self._lazy_globals[self._lazy_name] = value
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self._lazy_resolve(), name)
+
+    def __call__(self, *pargs, **kargs):
+        return self._lazy_resolve()(*pargs, **kargs)
+
+    def __instancecheck__(self, instance):
+        return isinstance(instance, self._lazy_resolve())
+
+    def __subclasscheck__(self, subclass):
+        return issubclass(subclass, self._lazy_resolve())
+
+    def __repr__(self):
+        if self._lazy_value is _UNRESOLVED:
+            return '<%s %s>' % (self.__class__.__name__, self._lazy_name)
+        return repr(self._lazy_value)
+
+
+class LazyModule(_LazyImport):
+    """Stands in for the name bound by one or more import statements.
+
+    Args:
+        module_globals: The globals of the importing module. They are used to
+            resolve the import and the proxy rebinds name in them.
+        name: The top level name the imports bind, 'a' for 'import a.b'.
+        module_names: The full names of all the modules imported under name.
+    """
+
+    __slots__ = ('_lazy_module_names',)
+
+    def __init__(self, module_globals, name, module_names):
+        _LazyImport.__init__(self, module_globals, name)
+        self._lazy_module_names = module_names
+
+    def _lazy_import(self):
+        for module_name in self._lazy_module_names:
+            module = __import__(module_name, self._lazy_globals)
+        return module
+
+
+class LazySymbol(_LazyImport):
+    """Stands in for the name bound by 'from module_name import symbol_name'.
+
+    Args:
+        module_globals: The globals of the importing module. They are used to
+            resolve the import and the proxy rebinds name in them.
+        name: The name the import binds, which differs from symbol_name if
+            the import is aliased.
+        module_name: The module to import from.
+        symbol_name: The name to import from the module.
+    """
+
+    __slots__ = ('_lazy_module_name', '_lazy_symbol_name')
+
+    def __init__(self, module_globals, name, module_name, symbol_name):
+        _LazyImport.__init__(self, module_globals, name)
+        self._lazy_module_name = module_name
+        self._lazy_symbol_name = symbol_name
+
+    def _lazy_import(self):
+        module = __import__(self._lazy_module_name, self._lazy_globals, None,
+                            [self._lazy_symbol_name])
+        try:
+            return getattr(module, self._lazy_symbol_name)
+        except AttributeError:
+            raise ImportError('cannot import name %s' % self._lazy_symbol_name)
@@ -0,0 +1,63 @@
+# Copyright 2016 The Spitfire Authors. All Rights Reserved.
+#
+# Use of this source code is governed by a BSD-style
+# license that can be found in the LICENSE file.
+
+import collections
+import os.path
+import unittest
+
+from spitfire.runtime import lazy
+
+
+class LazyModuleTest(unittest.TestCase):
+
+    def test_resolves_on_attribute_access(self):
+        module_globals = {}
+        proxy = lazy.LazyModule(module_globals, 'os', ('os.path',))
+        module_globals['os'] = proxy
+        self.assertEqual(proxy.path.join('a', 'b'), os.path.join('a', 'b'))
+        self.assertTrue(module_globals['os'] is os)
+
+    def test_imports_every_module(self):
+        proxy = lazy.LazyModule({}, 'xml', ('xml.dom', 'xml.sax'))
+        self.assertTrue(hasattr(proxy, 'dom'))
+        self.assertTrue(hasattr(proxy, 'sax'))
+
+    def test_missing_module(self):
+        proxy = lazy.LazyModule({}, 'no_such_module', ('no_such_module',))
+        self.assertRaises(ImportError, getattr, proxy, 'anything')
+
+
+class LazySymbolTest(unittest.TestCase):
+
+    def test_call(self):
+        module_globals = {}
+        proxy = lazy.LazySymbol(module_globals, 'join', 'os.path', 'join')
+        module_globals['join'] = proxy
+        self.assertEqual(proxy('a', 'b'), os.path.join('a', 'b'))
+        self.assertTrue(module_globals['join'] is os.path.join)
+
+    def test_rebinds_only_itself(self):
+        module_globals = {'join': None}
+        proxy = lazy.LazySymbol(module_globals, 'join', 'os.path', 'join')
+        proxy('a', 'b')
+        self.assertEqual(module_globals['join'], None)
+
+    def test_forwards_attributes(self):
+        proxy = lazy.LazySymbol({}, 'join', 'os.path', 'join')
+        self.assertEqual(proxy.__name__, 'join')
+
+    def test_isinstance(self):
+        proxy = lazy.LazySymbol({}, 'OrderedDict', 'collections',
+                                'OrderedDict')
+        self.assertTrue(isinstance(collections.OrderedDict(), proxy))
+        self.assertFalse(isinstance({}, proxy))
+
+    def test_missing_symbol(self):
+        proxy = lazy.LazySymbol({}, 'nope', 'os.path', 'nope')
+        self.assertRaises(ImportError, proxy)
+
+
+if __name__ == '__main__':
+    unittest.main()
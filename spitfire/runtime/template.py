@@ -6,9 +6,12 @@
 # an 'abstract' base class for a template, seems like a good idea for now
 
 import cStringIO as StringIO
+import functools
+import inspect
 
 from spitfire import runtime
 from spitfire.runtime import baked
+from spitfire.runtime import cache
 from spitfire.runtime import filters
 from spitfire.runtime import udn
 
@@ -18,6 +21,11 @@ except ImportError:
     _template = None
 
 
+DEFAULT_FLUSH_THRESHOLD = 64 * 1024
+# the number of results memoize_call keeps for each template instance.
+DEFAULT_MEMOIZE_CACHE_SIZE = 1024
+
+
 # NOTE: in some instances, this is faster than using cStringIO
 # this is slightly counter intuitive and probably means there is more here than
 # meets the eye.
@@ -28,6 +36,51 @@ class BufferIO(list):
         return ''.join(self)
 
 
+class FlushingBuffer(object):
+    """A buffer that writes its contents to a stream as it fills up.
+
+    Fragments are encoded and collected in a bytearray, which is written to
+    stream and emptied whenever it holds at least flush_threshold bytes, so
+    memory use doesn't grow with the size of the output.
+
+    Args:
+        stream: A file-like object with a write method.
+        flush_threshold: The number of bytes to collect before writing them.
+        encoding: The encoding used for unicode fragments.
+    """
+
+    def __init__(self,
+                 stream,
+                 flush_threshold=DEFAULT_FLUSH_THRESHOLD,
+                 encoding='utf-8'):
+        self.stream = stream
+        self.flush_threshold = flush_threshold
+        self.encoding = encoding
+        self._data = bytearray()
+
+    def write(self, value):
+        if isinstance(value, unicode):
+            value = value.encode(self.encoding)
+        self._data += value
+        if len(self._data) >= self.flush_threshold:
+            self.flush()
+
+    def extend(self, values):
+        for value in values:
+            self.write(value)
+
+    def flush(self):
+        if self._data:
+            self.stream.write(str(self._data))
+            del self._data[:]
+
+    def getvalue(self):
+        """Write out anything that's left. The output has all gone to the
+        stream, so this returns an empty string."""
+        self.flush()
+        return ''
+
+
 class _BaseSpitfireTemplate(object):
 
     # filter_function checks if the value should be filtered. If it is a
@@ -85,11 +138,21 @@ def get_spitfire_template_class(prefer_c_extension=True):
         _filter_function = staticmethod(filters.simple_str_filter)
         repeat = None
         placeholder_cache = None
+        output_stream = None
+        memoize_cache = None
+        memoize_cache_size = DEFAULT_MEMOIZE_CACHE_SIZE
+        fragment_cache = None
+        search_list_resolver = None
 
         def __init__(self,
                      search_list=None,
                      default_filter=None,
-                     use_placeholder_cache=False):
+                     use_placeholder_cache=False,
+                     output_stream=None,
+                     flush_threshold=DEFAULT_FLUSH_THRESHOLD,
+                     output_encoding='utf-8',
+                     fragment_cache=None,
+                     use_search_list_resolver=False):
             # use_placeholder_cache - cache the values returned from the
             # search_list?   The cached values will live for the lifetime of
             # this object.
@@ -98,28 +161,133 @@ def get_spitfire_template_class(prefer_c_extension=True):
                 self.placeholder_cache = {}
             if default_filter is not None:
                 self._filter_function = default_filter
+            # output_stream - write the output of the outermost template
+            # method called to this stream as it's rendered, with unicode
+            # encoded as output_encoding. that method then returns an empty
+            # string.
+            if output_stream is not None:
+                self.output_stream = output_stream
+                self.flush_threshold = flush_threshold
+                self.output_encoding = output_encoding
+                self._rendering = False
+                self._output_buffer_pending = False
+                self.new_buffer = self._new_output_buffer
+                for name in _get_output_method_names(type(self)):
+                    setattr(self, name,
+                            self._wrap_output_method(getattr(self, name)))
+            # fragment_cache - the backend for #cache blocks, see
+            # spitfire.runtime.cache.FragmentCache.
+            if fragment_cache is not None:
+                self.fragment_cache = fragment_cache
+            # use_search_list_resolver - remember where in the search_list
+            # each placeholder was found so later lookups skip straight to
+            # it. like the placeholder_cache, this assumes the search_list
+            # doesn't change while this object is alive.
+            if use_search_list_resolver and search_list is not None:
+                self.search_list_resolver = udn.SearchListResolver(search_list)
 
             # FIXME: repeater support is not needed most of the time, just
             # disable it for the time being
             # self.repeat = spitfire.runtime.repeater.RepeatTracker()
 
         def get_var(self, name, default=None):
+            if self.search_list_resolver is not None:
+                return self.search_list_resolver.resolve(name, default)
             return udn.resolve_from_search_list(self.search_list, name, default)
 
         def has_var(self, name):
             var = self.get_var(name, default=runtime.UnresolvedPlaceholder)
             return var is not runtime.UnresolvedPlaceholder
 
+        def memoize_call(self, function, *args):
+            # call a memoize_per_render function, reusing the result of an
+            # earlier call with the same arguments on this instance. this works
+            # alongside the placeholder_cache, which saves resolving the
+            # function itself.
+            memoize_cache = self.memoize_cache
+            if memoize_cache is None:
+                memoize_cache = cache.LRUCache(self.memoize_cache_size)
+                self.memoize_cache = memoize_cache
+            # 1, 1.0 and True are equal, but the function may well return
+            # something different for each of them.
+            key = (function, args, tuple(map(type, args)))
+            try:
+                return memoize_cache[key]
+            except KeyError:
+                pass
+            except TypeError:
+                # unhashable arguments can't be memoized.
+                return function(*args)
+            value = function(*args)
+            memoize_cache[key] = value
+            return value
+
+        # key is (module name, block number, key expression) for a #cache
+        # block.
+        def get_cached_fragment(self, key):
+            return self._get_fragment_cache().get('%s:%s:%s' % key)
+
+        def cache_fragment(self, key, value, ttl=None):
+            self._get_fragment_cache().set('%s:%s:%s' % key, value, ttl)
+            return value
+
+        def _get_fragment_cache(self):
+            if self.fragment_cache is None:
+                return cache.get_fragment_cache()
+            return self.fragment_cache
+
         @staticmethod
         def new_buffer():
             return BufferIO()
 
+        def _wrap_output_method(self, method):
+            # the outermost call is the one that streams. the flags are reset
+            # even if it raises, so the next render streams too.
+            @functools.wraps(method)
+            def output_method(*pargs, **kargs):
+                if self._rendering:
+                    return method(*pargs, **kargs)
+                self._rendering = True
+                self._output_buffer_pending = True
+                try:
+                    return method(*pargs, **kargs)
+                finally:
+                    self._rendering = False
+                    self._output_buffer_pending = False
+            return output_method
+
+        def _new_output_buffer(self):
+            # only the outermost method's own buffer goes to the stream.
+            # methods it calls return their output as usual, so it ends up in
+            # the right place in the stream.
+            if self._output_buffer_pending:
+                self._output_buffer_pending = False
+                return FlushingBuffer(self.output_stream, self.flush_threshold,
+                                      self.output_encoding)
+            return BufferIO()
+
     return _SpitfireTemplate
 
 
 SpitfireTemplate = get_spitfire_template_class()
 
 
+def _get_output_method_names(cls):
+    # the template methods that return their output, which are wrapped on
+    # templates that write to an output_stream. generators yield their output
+    # instead.
+    names = cls.__dict__.get('_output_method_names')
+    if names is None:
+        names = []
+        for name in dir(cls):
+            value = getattr(cls, name, None)
+            if (getattr(value, 'template_method', False) and
+                    not inspect.isgeneratorfunction(value)):
+                names.append(name)
+        cls._output_method_names = names = tuple(names)
+    return names
+
+
 def template_method(function):
     function.template_method = True
     function.skip_filter = True
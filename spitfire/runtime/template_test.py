@@ -3,9 +3,11 @@
 # Use of this source code is governed by a BSD-style
 # license that can be found in the LICENSE file.
 
+import cStringIO as StringIO
 import sys
 import unittest
 
+from spitfire.runtime import cache
 from spitfire.runtime import filters
 from spitfire.runtime import template
 from spitfire.runtime import baked
@@ -72,5 +74,157 @@ if _template is not None:
             prefer_c_extension=True)
 
 
+class TestFlushingBuffer(unittest.TestCase):
+
+    def test_flushes_at_threshold(self):
+        stream = StringIO.StringIO()
+        buffer = template.FlushingBuffer(stream, flush_threshold=4)
+        buffer.write('abc')
+        self.assertEqual(stream.getvalue(), '')
+        buffer.extend((u'd\xe9', 'f'))
+        self.assertEqual(stream.getvalue(), 'abcd\xc3\xa9')
+        self.assertEqual(buffer.getvalue(), '')
+        self.assertEqual(stream.getvalue(), 'abcd\xc3\xa9f')
+
+
+class _StreamingTemplate(template.SpitfireTemplate):
+
+    @template.template_method
+    def main(self):
+        _buffer = self.new_buffer()
+        _buffer.write(u'<p>')
+        _buffer.write(self.inner())
+        _buffer.write(u'</p>')
+        return _buffer.getvalue()
+
+    @template.template_method
+    def inner(self):
+        _buffer = self.new_buffer()
+        _buffer.extend((u'x', u'y'))
+        return _buffer.getvalue()
+
+    @template.template_method
+    def fail(self):
+        _buffer = self.new_buffer()
+        _buffer.write(u'a')
+        _buffer.write(self.inner())
+        raise ValueError
+
+
+class TestOutputStream(unittest.TestCase):
+
+    def test_default(self):
+        self.assertEqual(_StreamingTemplate().main(), u'<p>xy</p>')
+
+    def test_output_stream(self):
+        stream = StringIO.StringIO()
+        tmpl = _StreamingTemplate(output_stream=stream, flush_threshold=1)
+        self.assertEqual(tmpl.main(), '')
+        self.assertEqual(stream.getvalue(), '<p>xy</p>')
+        # each call to the outermost method streams its output.
+        self.assertEqual(tmpl.inner(), '')
+        self.assertEqual(stream.getvalue(), '<p>xy</p>xy')
+
+    def test_render_raises(self):
+        stream = StringIO.StringIO()
+        tmpl = _StreamingTemplate(output_stream=stream, flush_threshold=1)
+        self.assertRaises(ValueError, tmpl.fail)
+        self.assertEqual(stream.getvalue(), 'axy')
+        # the next render still streams.
+        self.assertEqual(tmpl.main(), '')
+        self.assertEqual(stream.getvalue(), 'axy<p>xy</p>')
+
+    def test_output_encoding(self):
+        stream = StringIO.StringIO()
+        tmpl = _StreamingTemplate(output_stream=stream,
+                                  output_encoding='latin-1')
+        tmpl.inner = lambda: u'\xe9'
+        self.assertEqual(tmpl.main(), '')
+        self.assertEqual(stream.getvalue(), '<p>\xe9</p>')
+
+
+class TestMemoizeCall(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+
+    def _function(self, *args):
+        self.calls.append(args)
+        return len(self.calls)
+
+    def test_memoize(self):
+        tmpl = template.SpitfireTemplate()
+        self.assertEqual(tmpl.memoize_call(self._function, 'a', 1), 1)
+        self.assertEqual(tmpl.memoize_call(self._function, 'a', 1), 1)
+        self.assertEqual(tmpl.memoize_call(self._function, 'a', 2), 2)
+        self.assertEqual(self.calls, [('a', 1), ('a', 2)])
+        # results are kept per instance.
+        tmpl = template.SpitfireTemplate()
+        self.assertEqual(tmpl.memoize_call(self._function, 'a', 1), 3)
+
+    def test_unhashable(self):
+        tmpl = template.SpitfireTemplate()
+        self.assertEqual(tmpl.memoize_call(self._function, []), 1)
+        self.assertEqual(tmpl.memoize_call(self._function, []), 2)
+
+    def test_argument_types(self):
+        tmpl = template.SpitfireTemplate()
+        self.assertEqual(tmpl.memoize_call(self._function, 1), 1)
+        self.assertEqual(tmpl.memoize_call(self._function, 1.0), 2)
+        self.assertEqual(tmpl.memoize_call(self._function, True), 3)
+        self.assertEqual(tmpl.memoize_call(self._function, 1), 1)
+
+    def test_bounded(self):
+        tmpl = template.SpitfireTemplate()
+        tmpl.memoize_cache_size = 2
+        for i in (1, 2, 1, 3, 1, 2):
+            tmpl.memoize_call(self._function, i)
+        self.assertEqual(self.calls, [(1,), (2,), (3,), (2,)])
+        self.assertEqual(len(tmpl.memoize_cache), 2)
+
+
+class _DictFragmentCache(dict):
+    # stands in for an external fragment cache backend.
+
+    def set(self, key, value, ttl=None):
+        self[key] = (value, ttl)
+
+
+class TestFragmentCache(unittest.TestCase):
+
+    def test_fragment_cache(self):
+        fragment_cache = _DictFragmentCache()
+        tmpl = template.SpitfireTemplate(fragment_cache=fragment_cache)
+        key = ('tmpl', 1, u'k')
+        self.assertEqual(tmpl.get_cached_fragment(key), None)
+        self.assertEqual(tmpl.cache_fragment(key, 'x', 60), 'x')
+        self.assertEqual(fragment_cache, {'tmpl:1:k': ('x', 60)})
+
+    def test_default_fragment_cache(self):
+        tmpl = template.SpitfireTemplate()
+        key = ('template_test', 1, None)
+        tmpl.cache_fragment(key, 'x')
+        self.assertEqual(cache.get_fragment_cache().get('template_test:1:None'),
+                         'x')
+        self.assertEqual(tmpl.get_cached_fragment(key), 'x')
+
+
+class TestSearchListResolver(unittest.TestCase):
+
+    def test_get_var(self):
+        tmpl = template.SpitfireTemplate(search_list=[{'a': 1}, {'b': 2}],
+                                         use_search_list_resolver=True)
+        self.assertTrue(tmpl.search_list_resolver is not None)
+        self.assertEqual(tmpl.get_var('b'), 2)
+        self.assertEqual(tmpl.get_var('b'), 2)
+        self.assertEqual(tmpl.get_var('c'), None)
+        self.assertTrue(tmpl.has_var('a'))
+        self.assertFalse(tmpl.has_var('c'))
+
+    def test_no_search_list(self):
+        tmpl = template.SpitfireTemplate(use_search_list_resolver=True)
+        self.assertTrue(tmpl.search_list_resolver is None)
+
+
 if __name__ == '__main__':
     unittest.main()
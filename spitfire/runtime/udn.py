@@ -12,6 +12,7 @@
 import __builtin__
 import inspect
 import logging
+import operator
 import weakref
 
 from spitfire import runtime
@@ -43,6 +44,24 @@ class __Unspecified(object):
 Unspecified = __Unspecified()
 
 
+# placeholder_cache markers for names that aren't attributes of the template
+# or in its search list. global_vars depend on the module of the calling
+# method, so they are still checked, followed by builtins unless the name is
+# known not to be a builtin either.
+class __NotInSearchList(object):
+    pass
+
+
+NotInSearchList = __NotInSearchList()
+
+
+class __NotFound(object):
+    pass
+
+
+NotFound = __NotFound()
+
+
 # Cheetah supports autocalling - Spitfire does not. this stand-in class will
 # raise an exception if you do something like compare a function object.
 class CallOnlyPlaceholder(object):
@@ -136,6 +155,8 @@ def _resolve_placeholder(name, template, global_vars):
     placeholder_cache = template.placeholder_cache
     if placeholder_cache and name in placeholder_cache:
         ph = placeholder_cache[name]
+        if ph is NotInSearchList or ph is NotFound:
+            return _resolve_global_placeholder(name, template, global_vars, ph)
         if isinstance(ph, weakref.ReferenceType):
             v = ph()
             if v is not None:
@@ -155,7 +176,16 @@ def _resolve_placeholder(name, template, global_vars):
         return result
 
     search_list = template.search_list
-    if search_list:
+    search_list_resolver = template.search_list_resolver
+    if search_list_resolver is not None:
+        ph = search_list_resolver.resolve(name)
+        if ph is not UnresolvedPlaceholder:
+            if placeholder_cache is not None:
+                # Use a weakref for methods to prevent memory cycles.
+                placeholder_cache[name] = weakref.ref(ph) if inspect.ismethod(
+                    ph) else ph
+            return ph
+    elif search_list:
         ph = resolve_from_search_list(search_list, name)
         if ph is not UnresolvedPlaceholder:
             if placeholder_cache is not None:
@@ -164,10 +194,15 @@ def _resolve_placeholder(name, template, global_vars):
                     ph) else ph
             return ph
 
-    # TODO: Cache negative results in placedholder_cache?
-    # This probably isn't worthwhile as it likely won't happen often enough
-    # to make the extra code/cpu/memory worthwhile.
+    # Remember the miss, so optional placeholders don't search everything
+    # again on every access.
+    if placeholder_cache is not None:
+        placeholder_cache[name] = NotInSearchList
+    return _resolve_global_placeholder(name, template, global_vars,
+                                       NotInSearchList)
+
 
+def _resolve_global_placeholder(name, template, global_vars, cached_marker):
     if global_vars is not None:
         try:
             return global_vars[name]
@@ -179,10 +214,13 @@ def _resolve_placeholder(name, template, global_vars):
 
     # fixme: finally try to resolve builtins - this should be configurable
     # if you compile optimized modes, this isn't necessary
-    try:
-        return getattr(__builtin__, name)
-    except AttributeError:
-        return UndefinedPlaceholder(name, search_list)
+    if cached_marker is not NotFound:
+        try:
+            return getattr(__builtin__, name)
+        except AttributeError:
+            if template.placeholder_cache is not None:
+                template.placeholder_cache[name] = NotFound
+    return UndefinedPlaceholder(name, template.search_list)
 
 
 # FIXME: i'm sure this is a little pokey - might be able to speed this up
@@ -238,6 +276,125 @@ def _resolve_from_search_list(search_list, name, default=Unspecified):
     else:
         return UnresolvedPlaceholder
 
+
+class SearchListResolver(object):
+    """Resolves names from a search list like resolve_from_search_list.
+
+    The scope and kind of access (item or attribute) that found a name are
+    remembered, as are misses, so later lookups of the name go straight to the
+    right place instead of probing every scope. This assumes the search list
+    doesn't change, so a resolver should only live as long as the template
+    instance it was made for.
+    """
+
+    def __init__(self, search_list):
+        self.search_list = search_list
+        # name -> (scope, use_item), or None for a miss.
+        self._plans = {}
+
+    def resolve(self, name, default=Unspecified):
+        plan = self._plans.get(name, MissingAttr)
+        if plan is MissingAttr:
+            value = self._search(name)
+        elif plan is None:
+            value = UnresolvedPlaceholder
+        else:
+            scope, use_item = plan
+            try:
+                if use_item:
+                    return scope[name]
+                return getattr(scope, name)
+            except (TypeError, KeyError, AttributeError):
+                # the scope changed after all, search again.
+                value = self._search(name)
+
+        if value is UnresolvedPlaceholder and default is not Unspecified:
+            return default
+        return value
+
+    def _search(self, name):
+        plans = self._plans
+        try:
+            for scope in self.search_list:
+                try:
+                    value = scope[name]
+                    plans[name] = (scope, True)
+                    return value
+                except (TypeError, KeyError):
+                    pass
+
+                try:
+                    value = getattr(scope, name)
+                    plans[name] = (scope, False)
+                    return value
+                except AttributeError:
+                    pass
+        except TypeError:
+            # if this isn't iterable, nothing resolves.
+            pass
+        plans[name] = None
+        return UnresolvedPlaceholder
+
+
+# the number of types an inline cache holds plans for. a call site that sees
+# more types than this resolves the rest with resolve_udn.
+UDN_INLINE_CACHE_SIZE = 8
+
+
+# instances of a dict type without a __dict__ can't have an attribute that
+# isn't on the type, so looking the name up as an item is all resolve_udn
+# would do.
+def _udn_item_only(cls, name):
+    if not issubclass(cls, dict) or cls.__dictoffset__ or hasattr(cls, name):
+        return False
+    for base in cls.__mro__:
+        if base is dict or base is object:
+            continue
+        if '__getattr__' in vars(base) or '__getattribute__' in vars(base):
+            return False
+    return True
+
+
+def make_udn_inline_cache(name, raise_exception=False):
+    """Returns a resolve_udn for a single name and call site.
+
+    The first time it sees a type, it works out whether the name was found as
+    an attribute or an item and remembers a getter for the type, so later
+    objects of the same type cost a type lookup and a direct access. When the
+    remembered access fails, or the type couldn't be planned, it falls back to
+    resolve_udn.
+    """
+    get_attr = operator.attrgetter(name)
+    get_item = operator.itemgetter(name)
+    plans = {}
+
+    def resolve_generic(_object):
+        return resolve_udn(_object, name, raise_exception=raise_exception)
+
+    def resolve_uncached(_object):
+        cls = type(_object)
+        if cls not in plans and len(plans) < UDN_INLINE_CACHE_SIZE:
+            if _udn_item_only(cls, name):
+                plans[cls] = get_item
+            else:
+                value = getattr(_object, name, MissingAttr)
+                if value is not MissingAttr:
+                    plans[cls] = get_attr
+                    return value
+                plans[cls] = resolve_generic
+        return resolve_generic(_object)
+
+    def resolve_udn_inline(_object):
+        try:
+            return plans[type(_object)](_object)
+        except (AttributeError, KeyError, TypeError):
+            # either there's no plan for this type yet or it didn't work for
+            # this object.
+            return resolve_uncached(_object)
+
+    return resolve_udn_inline
+
+
 # Define Python/C alternates.
 _python_resolve_from_search_list = _resolve_from_search_list
 _python_resolve_udn = _resolve_udn
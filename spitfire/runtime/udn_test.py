@@ -22,6 +22,7 @@ class Foo(object):
     bar = 'baz'
     search_list = [{'win': 'boo'}, Scope(),]
     placeholder_cache = None
+    search_list_resolver = None
 
     def foo_method(self):
       pass
@@ -78,6 +79,44 @@ class TestResolvePlaceholderWithCache(unittest.TestCase):
         self.assertEqual(udn.resolve_placeholder('foo_method', template, None),
                          template.foo_method)
 
+    def test_miss(self):
+        template = Foo()
+        template.placeholder_cache = {}
+        self.assertEqual(type(udn.resolve_placeholder('wowza', template, None)),
+                         runtime.UndefinedPlaceholder)
+        self.assertTrue(template.placeholder_cache['wowza'] is udn.NotFound)
+        # the search list isn't checked again.
+        template.search_list = None
+        self.assertEqual(type(udn.resolve_placeholder('wowza', template, None)),
+                         runtime.UndefinedPlaceholder)
+
+    def test_miss_in_globals(self):
+        template = Foo()
+        template.placeholder_cache = {}
+        self.assertEqual(
+            udn.resolve_placeholder('blam', template, {'blam': 'bling'}),
+            'bling')
+        self.assertTrue(
+            template.placeholder_cache['blam'] is udn.NotInSearchList)
+        # globals differ between the modules of a template's methods.
+        self.assertEqual(
+            udn.resolve_placeholder('blam', template, {'blam': 'blong'}),
+            'blong')
+        self.assertEqual(type(udn.resolve_placeholder('blam', template, {})),
+                         runtime.UndefinedPlaceholder)
+        self.assertTrue(template.placeholder_cache['blam'] is udn.NotFound)
+        self.assertEqual(
+            udn.resolve_placeholder('blam', template, {'blam': 'bling'}),
+            'bling')
+
+    def test_builtin(self):
+        template = Foo()
+        template.placeholder_cache = {}
+        self.assertEqual(udn.resolve_placeholder('str', template, None), str)
+        self.assertTrue(
+            template.placeholder_cache['str'] is udn.NotInSearchList)
+        self.assertEqual(udn.resolve_placeholder('str', template, None), str)
+
 
 class TestResolvePlaceholderWithLocals(unittest.TestCase):
 
@@ -87,6 +126,59 @@ class TestResolvePlaceholderWithLocals(unittest.TestCase):
                                                 None), 'bar')
 
 
+class TestSearchListResolver(unittest.TestCase):
+
+    def test_item(self):
+        resolver = udn.SearchListResolver([{'win': 'boo'}, Scope()])
+        self.assertEqual(resolver.resolve('win'), 'boo')
+        self.assertEqual(resolver.resolve('win'), 'boo')
+
+    def test_attr(self):
+        resolver = udn.SearchListResolver([{'win': 'boo'}, Scope()])
+        self.assertEqual(resolver.resolve('boom'), 'bam')
+        self.assertEqual(resolver.resolve('boom'), 'bam')
+
+    def test_miss(self):
+        resolver = udn.SearchListResolver([{'win': 'boo'}, Scope()])
+        self.assertTrue(
+            resolver.resolve('wowza') is runtime.UnresolvedPlaceholder)
+        self.assertTrue(
+            resolver.resolve('wowza') is runtime.UnresolvedPlaceholder)
+        self.assertEqual(resolver.resolve('wowza', 'default'), 'default')
+
+    def test_not_iterable(self):
+        resolver = udn.SearchListResolver(None)
+        self.assertTrue(
+            resolver.resolve('win') is runtime.UnresolvedPlaceholder)
+
+    def test_scope_changed(self):
+        scope = {'win': 'boo'}
+        resolver = udn.SearchListResolver([scope, {'win': 'bam'}])
+        self.assertEqual(resolver.resolve('win'), 'boo')
+        del scope['win']
+        self.assertEqual(resolver.resolve('win'), 'bam')
+
+    def test_matches_resolve_from_search_list(self):
+        search_list = [{'win': 'boo'}, Scope(), {'boom': 'bang', 'str': 'x'}]
+        resolver = udn.SearchListResolver(search_list)
+        for _ in range(2):
+            for name in ('win', 'boom', 'str', 'keys', 'wowza'):
+                self.assertEqual(
+                    resolver.resolve(name),
+                    udn.resolve_from_search_list(search_list, name))
+
+    def test_resolve_placeholder(self):
+        template = Foo()
+        template.search_list_resolver = udn.SearchListResolver(
+            template.search_list)
+        template.search_list = None
+        self.assertEqual(udn.resolve_placeholder('win', template, None), 'boo')
+        self.assertEqual(udn.resolve_placeholder('boom', template, None), 'bam')
+        self.assertEqual(
+            udn.resolve_placeholder('blam', template, {'blam': 'bling'}),
+            'bling')
+
+
 class Baz(object):
     bar = 'win'
 
@@ -124,6 +216,57 @@ class _UdnTest(object):
                           raise_exception=True)
 
 
+class _Row(dict):
+    __slots__ = ()
+
+
+class _AttrDict(dict):
+
+    def __getattr__(self, name):
+        return 'attr'
+
+
+class TestUdnInlineCache(unittest.TestCase):
+
+    def test_item(self):
+        resolve = udn.make_udn_inline_cache('bar')
+        for _ in range(2):
+            self.assertEqual(resolve({'bar': 'win'}), 'win')
+            self.assertEqual(resolve(_Row(bar='win')), 'win')
+            self.assertIsInstance(resolve({}), runtime.UndefinedAttribute)
+
+    def test_attr(self):
+        resolve = udn.make_udn_inline_cache('bar')
+        for _ in range(2):
+            self.assertEqual(resolve(Baz()), 'win')
+            self.assertEqual(resolve(Foo()), 'baz')
+
+    def test_item_and_attr_names(self):
+        # keys is an attribute of dicts, so it isn't looked up as an item.
+        resolve = udn.make_udn_inline_cache('keys')
+        row = {'keys': 1}
+        for _ in range(2):
+            self.assertEqual(resolve(row), udn.resolve_udn(row, 'keys'))
+        resolve = udn.make_udn_inline_cache('bar')
+        for _ in range(2):
+            self.assertEqual(resolve(_AttrDict(bar='win')), 'attr')
+
+    def test_miss(self):
+        resolve = udn.make_udn_inline_cache('missing')
+        for _ in range(2):
+            self.assertIsInstance(resolve(Baz()), runtime.UndefinedAttribute)
+        resolve = udn.make_udn_inline_cache('missing', raise_exception=True)
+        for _ in range(2):
+            self.assertRaises(runtime.UDNResolveError, resolve, Baz())
+
+    def test_instance_attr(self):
+        resolve = udn.make_udn_inline_cache('bar')
+        scope = Scope()
+        scope.bar = 'win'
+        self.assertEqual(resolve(scope), 'win')
+        self.assertIsInstance(resolve(Scope()), runtime.UndefinedAttribute)
+
+
 if _udn is not None:
 
     class TestUdnC(_UdnTest, unittest.TestCase):